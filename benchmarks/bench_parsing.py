@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# bench_parsing.py
+# Compares parse times for saved gbf.wiki pages across BeautifulSoup
+# backends, with and without the strainers in silva.utilities.html_parsing.
+#
+# Save a page's parsed HTML first, ie:
+#   curl 'https://gbf.wiki/api.php?action=parse&format=json&pageid=12345' \
+#     | jq -r '.parse.text["*"]' > summon.html
+# then run from the repository root:
+#   python benchmarks/bench_parsing.py summon.html --kind summon
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from silva.utilities import html_parsing  # noqa: E402
+
+STRAINERS = {
+    "summon": html_parsing.SUMMON_STRAINER,
+    "weapon": html_parsing.WEAPON_STRAINER,
+}
+
+
+def available_parsers() -> list:
+    parsers = ["html.parser"]
+    try:
+        import lxml  # noqa
+        parsers.append("lxml")
+    except ImportError:
+        pass
+    return parsers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark wiki page parsing.")
+    parser.add_argument("pages", nargs="+", help="saved HTML files")
+    parser.add_argument("--kind", choices=STRAINERS.keys(), default="summon")
+    parser.add_argument("--number", "-n", type=int, default=20)
+    args = parser.parse_args()
+    strainer = STRAINERS[args.kind]
+    for path in args.pages:
+        with open(path, encoding="utf-8") as fp:
+            text = fp.read()
+        print(f"{path} ({len(text) / 1024:.0f} KiB)")
+        for backend in available_parsers():
+            for label, parse_only in (("full", None), ("strained", strainer)):
+                seconds = timeit.timeit(
+                    lambda: html_parsing.parse_sync(text, parse_only, backend),
+                    number=args.number,
+                )
+                per_parse = seconds / args.number * 1000
+                print(f"  {backend:<12} {label:<9} {per_parse:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,9 @@ from configparser import ConfigParser
 import logging
 from discord.ext import commands
 from silva.bot_commands import Silva, Aliases, Misc, Pronouns
-from silva.utilities import granblue_twitter, scheduled_commands
+from silva.utilities import granblue_twitter, scheduled_commands, http_client, gbfwiki
+from silva.utilities import page_cache, summons, event_publisher, event_archive
+from silva.utilities import weapons
 import discord
 import aiosqlite
 import asyncio
@@ -35,12 +37,32 @@ bot = commands.Bot(
     intents=intents
 )
 bot.aliases_conn = "aliases.sqlite3"
+bot.wiki_cache_conn = "wiki_cache.sqlite3"
 bot.events_channel = config["twitter"]["discord_news_feed_channel_id"]
 
 setattr(bot, "events_channel", int(config["twitter"]["discord_events_channel_id"]))
 
 setattr(bot, "is_following", False)
 
+# One pooled HTTP client shared by every outbound request.
+bot.http_client = loop.run_until_complete(http_client.HttpClient.create())
+bot.event_cache = gbfwiki.EventCache(
+    bot.http_client, ttl=config.getint("wiki", "event_cache_ttl", fallback=300)
+)
+bot.event_publisher = event_publisher.EventPublisher(
+    bot, announce_new=config.getboolean("wiki", "announce_new_events", fallback=True)
+)
+bot.event_archive = event_archive.EventArchive(bot.aliases_conn)
+bot.page_cache = page_cache.PageCache(bot.wiki_cache_conn)
+bot.summon_index = summons.SummonIndex(bot.wiki_cache_conn)
+# Filled in the background, so its requests yield to commands'.
+bot.weapon_pool = weapons.WeaponPool(
+    gbfwiki.Wiki(bot.http_client.as_background(), bot.page_cache),
+    bot.wiki_cache_conn,
+)
+bot.summon_resolver = summons.SummonResolver()
+bot.weapon_search = weapons.WeaponSearch(bot.wiki_cache_conn)
+
 bot.add_cog(Silva.Commands(bot))
 bot.add_cog(Misc.Commands(bot))
 bot.add_cog(Aliases.Commands(bot))
@@ -87,6 +109,62 @@ async def on_connect():
             "CREATE UNIQUE INDEX IF NOT EXISTS" " idx_raid_group ON raidroles(role_id)"
         )
         await db.execute(cmd)
+        cmd: str = (
+            "CREATE TABLE IF NOT EXISTS event_messages"
+            " (channel_id int primary key,"
+            " current_message_id int, upcoming_message_id int)"
+        )
+        await db.execute(cmd)
+        cmd: str = (
+            "CREATE TABLE IF NOT EXISTS event_history"
+            " (name text, utc_start int, utc_end int, time_start text,"
+            " time_end text, element text, wiki_page text,"
+            " UNIQUE(name, utc_start))"
+        )
+        await db.execute(cmd)
+        cmd: str = (
+            "CREATE INDEX IF NOT EXISTS"
+            " idx_event_history_name ON event_history(name COLLATE NOCASE)"
+        )
+        await db.execute(cmd)
+        cmd: str = (
+            "CREATE INDEX IF NOT EXISTS"
+            " idx_event_history_start ON event_history(utc_start)"
+        )
+        await db.execute(cmd)
+        await db.commit()
+    async with aiosqlite.connect(bot.wiki_cache_conn) as db:
+        cmd: str = (
+            "CREATE TABLE IF NOT EXISTS pages"
+            " (pageid integer primary key, revid int, title text, text text)"
+        )
+        await db.execute(cmd)
+        cmd: str = (
+            "CREATE TABLE IF NOT EXISTS summons"
+            " (pageid integer primary key, revid int, name text, call text,"
+            " first_half text, second_half text)"
+        )
+        await db.execute(cmd)
+        cmd: str = (
+            "CREATE TABLE IF NOT EXISTS weapons"
+            " (pageid integer primary key, title text)"
+        )
+        await db.execute(cmd)
+        cmd: str = (
+            "CREATE TABLE IF NOT EXISTS cache_times"
+            " (name text primary key, fetched_at real)"
+        )
+        await db.execute(cmd)
+        cmd: str = (
+            "CREATE VIRTUAL TABLE IF NOT EXISTS weapon_text"
+            " USING fts5(pageid UNINDEXED, name, flavor)"
+        )
+        await db.execute(cmd)
+        cmd: str = (
+            "CREATE TABLE IF NOT EXISTS weapon_text_revisions"
+            " (pageid integer primary key, revid int)"
+        )
+        await db.execute(cmd)
         await db.commit()
 
 
@@ -104,7 +182,13 @@ async def on_ready():
         twitter_database_db=config["database"]["database"],
         twitter_database_host=config["database"]["host"],
         twitter_database_username=config["database"]["username"],
-        twitter_database_password=config["database"]["password"]
+        twitter_database_password=config["database"]["password"],
+        retention_months=config.getint(
+            "twitter", "tweet_retention_months", fallback=12
+        ),
+        unread_retention_months=config.getint(
+            "twitter", "tweet_unread_retention_months", fallback=24
+        ),
     )
     await bot.twitter.follow()
 
@@ -124,10 +208,15 @@ try:
     loop.run_until_complete(bot.login(token=TOKEN))
     scheduled = scheduled_commands.ScheduledEvents(bot)
     loop.create_task(scheduled.update_events())
+    loop.create_task(scheduled.update_summon_index())
+    loop.create_task(scheduled.update_event_archive())
+    loop.create_task(scheduled.fill_weapon_pool())
+    loop.create_task(scheduled.update_weapon_search())
     loop.run_until_complete(bot.connect())
 except KeyboardInterrupt:
     logging.info("Logging out. (You might need to ctrl-C twice.)")
-    loop.run_until_complete(bot.twitter.client.conn.close())
+    loop.run_until_complete(bot.twitter.client.close())
     loop.run_until_complete(bot.logout())
 finally:
+    loop.run_until_complete(bot.http_client.close())
     loop.close()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# ingest.py
+# Scrapes twitter for tweets from the accounts in the environment variable
+# SNSCRAPE_TWITTER_USERS (separated by commas) into the Silva database.
+from silva.utilities.ingester import Ingester
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+parser = argparse.ArgumentParser(description="Scrapes tweets for Silva.")
+parser.add_argument(
+    "--concurrency", type=int, default=4, help="snscrape processes to run at once."
+)
+parser.add_argument(
+    "--interval", type=float, default=2, help="seconds to wait between passes."
+)
+args = parser.parse_args()
+
+log_format = "[%(filename)s:%(lineno)s:%(funcName)s() ]%(asctime)s - %(levelname)s - %(message)s"  # noqa
+logging.basicConfig(level=logging.INFO, format=log_format)
+
+settings = {}
+for name in ("TWITTER_USERS", "DATABASE_DB", "DATABASE_HOST",
+             "DATABASE_USERNAME", "DATABASE_PASSWORD"):
+    settings[name] = os.environ.get(f"SNSCRAPE_{name}")
+    if not settings[name]:
+        sys.exit(f"SNSCRAPE_{name} not set.")
+
+conn = (
+    f"user={settings['DATABASE_USERNAME']} password={settings['DATABASE_PASSWORD']}"
+    f" dbname={settings['DATABASE_DB']} host={settings['DATABASE_HOST']}"
+)
+usernames = [x for x in settings["TWITTER_USERS"].split(",") if x]
+
+
+async def main():
+    ingester = Ingester(
+        conn, usernames, concurrency=args.concurrency, interval=args.interval
+    )
+    try:
+        await ingester.run()
+    finally:
+        await ingester.close()
+
+
+try:
+    asyncio.get_event_loop().run_until_complete(main())
+except KeyboardInterrupt:
+    logging.info("Stopped scraping.")
@@ -86,7 +86,7 @@ class Commands(commands.Cog, name="Misc. commands"):
         emoji_regex = r"(^\\?<a?:\w+:\d+>$)|(^\\?.$)"
         if not re.match(emoji_regex, emoji):
             return await ctx.send("No emoji found.")
-        utils = misc.EmojiUtils()
+        utils = misc.EmojiUtils(self.bot.http_client)
         # strip out any backslashes in our emoji string.
         emoji = emoji.replace("\\", "")
         # For standard emoji, check to see if we can grab the image
@@ -129,7 +129,7 @@ class Commands(commands.Cog, name="Misc. commands"):
         emoji_regex = r"(^\\?<a?:\w+:\d+>$)|(^\\?.$)"
         if not re.match(emoji_regex, emoji):
             return await ctx.send("No emoji found.")
-        utils = misc.EmojiUtils()
+        utils = misc.EmojiUtils(self.bot.http_client)
         # strip out any backslashes in our emoji string.
         emoji = emoji.replace("\\", "")
         # For standard emoji, check to see if we can grab the image
@@ -174,7 +174,7 @@ class Commands(commands.Cog, name="Misc. commands"):
         emoji_regex = r"(^\\?<a?:\w+:\d+>$)|(^\\?.$)"
         if not re.match(emoji_regex, emoji):
             return await ctx.send("No emoji found.")
-        utils = misc.EmojiUtils()
+        utils = misc.EmojiUtils(self.bot.http_client)
         # strip out any backslashes in our emoji string.
         emoji = emoji.replace("\\", "")
         # For standard emoji, check to see if we can grab the image
@@ -214,7 +214,7 @@ class Commands(commands.Cog, name="Misc. commands"):
         Gets a random cat picture from Wikipedia.
         """
         logging.info(f"{ctx.author} requested a cat picture.")
-        cat = wikimedia_cats.wikicats()
+        cat = wikimedia_cats.wikicats(self.bot.http_client)
         init_msg = await ctx.send("BETA: Getting a cat picture, one sec.")
         async with ctx.channel.typing():
             await cat.async_init()
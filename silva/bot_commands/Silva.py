@@ -1,9 +1,9 @@
 import logging
 from discord.ext import commands
 from discord import Embed, Colour
-import aiohttp
-from silva.utilities import gbfwiki, misc
+from silva.utilities import gbfwiki, misc, summons
 from datetime import datetime
+import asyncio
 import random
 import pytz
 
@@ -133,13 +133,10 @@ class Commands(commands.Cog, name="GBF-related commands"):
         bot = self.bot
         text_utils = self.text_utils
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://api.pycatfacts.com/", timeout=10
-                ) as fact:
-                    status = fact.status
-                    text = await fact.json()
-                    text = text["fact"]
+            fact = await bot.http_client.get("https://api.pycatfacts.com/")
+            status = fact.status
+            text = fact.json()
+            text = text["fact"]
             if status >= 400:
                 new_text = random.choice(
                     [
@@ -175,59 +172,24 @@ class Commands(commands.Cog, name="GBF-related commands"):
         logging.info(f"events requested by {ctx.author} in {guild}.")
         thinking_msg = "One sec, grabbing the current and upcoming events."
         msg = await ctx.send(thinking_msg)
-        now = datetime.utcnow().replace(tzinfo=pytz.utc)
         try:
-            wiki = await gbfwiki.init_wiki()
-            events = wiki.get_events()
-            msg_current = Embed(
-                title="Granblue Fantasy Current Events",
-                url="https://gbf.wiki",
-                color=Colour.teal(),
-                timestamp=now,
-            )
-            for event in events["current"]:
-                msg_current.add_field(
-                    name=f"[{event['title']}]({event['url']})",
-                    value=f"Ends on {event['finish']}",
-                    inline=False,
-                )
-            msg_upcoming = Embed(
-                title="Granblue Fantasy Upcoming Events",
-                url="https://gbf.wiki",
-                color=Colour.dark_purple(),
-                timestamp=now,
-            )
-            for event in events["upcoming"]:
-                msg_upcoming.add_field(
-                    name=f"[{event['title']}]({event['url']})",
-                    value=f"{event['start']} to {event['finish']}",
-                    inline=False,
-                )
+            wiki = await self.bot.event_cache.get()
+            timeline = wiki.get_timeline()
+            publisher = self.bot.event_publisher
             # send to a dedicated event channel if the message is not a DM
             if ctx.guild:
                 events_channel = self.bot.get_channel(self.bot.events_channel)
+                # Edits the bot's pinned events messages in the events
+                # channel, unless they already show these events. Best used
+                # for an events channel that is locked to posting only by
+                # the bot.
+                await publisher.publish(events_channel, timeline)
             else:
                 events_channel = ctx
-            # If the event channel exists, search to see if the bot has posted
-            # existing events before. If so, edit those instead of sending
-            # a new embed. Best used for an events channel that is locked to
-            # posting only by the bot.
-            if ctx.guild:
-                existing_messages = []
-                async for message in events_channel.history(limit=200):
-                    # Assume the first message to edit is the current events,
-                    # and the second message is the upcoming events.
-                    if message.author == self.bot.user and message.pinned:
-                        existing_messages.append(message)
-                    if len(existing_messages) >= 2:
-                        break
-                if not existing_messages:
-                    await events_channel.send(embed=msg_current)
-                    await events_channel.send(embed=msg_upcoming)
-                else:
-                    await existing_messages[0].edit(embed=msg_current)
-                    await existing_messages[1].edit(embed=msg_upcoming)
-            else:
+                now = datetime.utcnow().replace(tzinfo=pytz.utc).timestamp()
+                msg_current, msg_upcoming = publisher.build_embeds(
+                    *timeline.split(now)
+                )
                 await events_channel.send(embed=msg_current)
                 await events_channel.send(embed=msg_upcoming)
             if ctx.guild:
@@ -242,6 +204,152 @@ class Commands(commands.Cog, name="GBF-related commands"):
             logging.warning(f"Could not retrieve events: {e}")
             await msg.edit(content="I couldn't retrieve the events at this time.")
 
+    @commands.command(name="soon", aliases=["eventsoon"])
+    async def events_soon(self, ctx, hours: int = 24):
+        """
+        Lists the events starting and ending within the next few hours.
+        :param hours (int): how many hours ahead to look. 24 by default.
+        """
+        guild = ctx.guild if ctx.guild else "a direct message"
+        logging.info(f"soon requested by {ctx.author} in {guild}.")
+        if hours < 1 or hours > 24 * 30:
+            return await ctx.send("Pick a number of hours between 1 and 720.")
+        try:
+            wiki = await self.bot.event_cache.get()
+        except Exception as e:
+            logging.warning(f"Could not retrieve events: {e}")
+            return await ctx.send("I couldn't retrieve the events at this time.")
+        timeline = wiki.get_timeline()
+        now = datetime.utcnow().replace(tzinfo=pytz.utc).timestamp()
+        until = now + hours * 3600
+        starting = timeline.starting_between(now, until)
+        ending = timeline.ending_between(now, until)
+        msg_soon = Embed(
+            title=f"Granblue Fantasy events in the next {hours} hours",
+            url="https://gbf.wiki",
+            color=Colour.teal(),
+        )
+        for event in starting:
+            msg_soon.add_field(
+                name=f"Starts: [{event.title}]({event.url})",
+                value=f"{event.start}",
+                inline=False,
+            )
+        for event in ending:
+            msg_soon.add_field(
+                name=f"Ends: [{event.title}]({event.url})",
+                value=f"{event.finish}",
+                inline=False,
+            )
+        if not starting and not ending:
+            msg_soon.description = "Nothing starts or ends in that time."
+        return await ctx.send(embed=msg_soon)
+
+    @commands.command(name="history", aliases=["eventhistory", "reruns"])
+    async def event_history(self, ctx, *, name: str = None):
+        """
+        Shows when an event ran before and how often it comes back.
+        :param name (str): the event name, or the start of it.
+        """
+        guild = ctx.guild if ctx.guild else "a direct message"
+        logging.info(f"history requested by {ctx.author} in {guild} with args '{name}'.")
+        if not name:
+            msg = f"To use: `{self.bot.COMMAND_PREFIX}history event name`"
+            return await ctx.send(msg)
+        runs = await self.bot.event_archive.get_history(name)
+        if not runs:
+            return await ctx.send(f'I have no record of an event called "{name}".')
+        titles = {run["name"] for run in runs}
+        title = runs[0]["name"] if len(titles) == 1 else f"Events matching {name}"
+        msg_history = Embed(
+            title=title,
+            url="https://gbf.wiki",
+            color=Colour.dark_purple(),
+        )
+        starts = [run["utc_start"] for run in runs]
+        if len(titles) == 1 and len(starts) > 1:
+            gaps = [(a - b) / 86400 for a, b in zip(starts, starts[1:])]
+            msg_history.description = (
+                f"Ran {len(runs)} times, on average every"
+                f" {sum(gaps) / len(gaps):.0f} days."
+            )
+        for run in runs[:10]:
+            msg_history.add_field(
+                name=run["name"],
+                value=f"{run['time_start']} to {run['time_end'] or '?'}",
+                inline=False,
+            )
+        return await ctx.send(embed=msg_history)
+
+    @commands.command(name="weapon", aliases=["flavor", "flavortext"])
+    async def random_weapon(self, ctx):
+        """
+        Gets the flavor text of a random weapon from gbf.wiki.
+        """
+        guild = ctx.guild if ctx.guild else "a direct message"
+        logging.info(f"weapon requested by {ctx.author} in {guild}.")
+        try:
+            description = await asyncio.wait_for(
+                self.bot.weapon_pool.randomWeaponDescription(), timeout=15
+            )
+        except asyncio.TimeoutError:
+            return await ctx.send("I couldn't find a weapon at this time.")
+        name, text = next(iter(description.items()))
+        return await ctx.send(f"**{name}**: {text}")
+
+    @commands.command(name="weaponsearch", aliases=["flavorsearch"])
+    async def weapon_search(self, ctx, *, query: str = None):
+        """
+        Searches weapon names and flavor text from gbf.wiki.
+        """
+        guild = ctx.guild if ctx.guild else "a direct message"
+        logging.info(
+            f"weaponsearch requested by {ctx.author} in {guild} with args '{query}'."
+        )
+        if not query:
+            msg = f"To use: `{self.bot.COMMAND_PREFIX}weaponsearch words to find`"
+            return await ctx.send(msg)
+        matches = await self.bot.weapon_search.search(query)
+        if not matches:
+            return await ctx.send(f"I couldn't find a weapon matching '{query}'.")
+        msg = "\n".join(f"**{name}**: {flavor}" for name, flavor in matches)
+        return await ctx.send(msg[:2000])
+
+    @commands.command(name="combo", aliases=["combocall"])
+    async def combo_name(self, ctx, *, names: str = None):
+        """
+        Gets the combo call name of two summons, separated by a comma.
+        Partial or misspelled summon names are fine.
+        """
+        guild = ctx.guild if ctx.guild else "a direct message"
+        logging.info(f"combo requested by {ctx.author} in {guild} with args '{names}'.")
+        if not names or len(names.split(",")) != 2:
+            msg = f"To use: `{self.bot.COMMAND_PREFIX}combo summon1, summon2`"
+            return await ctx.send(msg)
+        resolver = self.bot.summon_resolver
+        wiki = gbfwiki.Wiki(self.bot.http_client, self.bot.page_cache)
+        try:
+            # The scheduled crawl builds the resolver; build it here if
+            # someone asks before that has run.
+            if not resolver.titles:
+                resolver.refresh(await wiki.get_summons_page())
+            summon1, summon2 = [
+                resolver.resolve(name.strip()) for name in names.split(",")
+            ]
+            combo = await self.bot.summon_index.get_combo_name(
+                wiki, summon1[0], summon2[0]
+            )
+        except summons.SummonResolver.NoSummonFound as e:
+            return await ctx.send(f"{e}")
+        except gbfwiki.Wiki.UncrossableSummonsException:
+            return await ctx.send(
+                f"**{summon1[1]}** and **{summon2[1]}** don't have a combo call."
+            )
+        except Exception as e:
+            logging.warning(f"Could not get combo name: {e}")
+            return await ctx.send("I couldn't get the combo call at this time.")
+        return await ctx.send(f"**{summon1[1]}** + **{summon2[1]}**: {combo}")
+
     @commands.command(name="add-my-role", aliases=["addmyrole"])
     async def add_raid_role(self, ctx, *, role_name: str):
         """
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# event_archive.py
+# A local archive of every gbf.wiki event_history row, synced incrementally
+# so questions about past runs never have to touch the network.
+
+import aiosqlite
+from typing import Dict, List
+from silva.utilities.gbfwiki import Wiki
+
+# Rows this far behind the newest archived start are fetched again on each
+# sync, to pick up late additions and corrections on the wiki.
+RESYNC_WINDOW = 30 * 24 * 3600
+
+
+class EventArchive:
+    def __init__(self, conn: str):
+        self.conn = conn
+
+    async def get_watermark(self) -> int:
+        """
+        Gets the latest event start time in the archive, or 0 if it's empty.
+        """
+        cmd: str = """
+        SELECT max(utc_start) FROM event_history;
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            async with db.execute(cmd) as cursor:
+                row = await cursor.fetchone()
+        return row[0] or 0
+
+    async def sync(self, wiki: Wiki, batch_size: int = 500) -> int:
+        """
+        Fetches the event_history rows newer than the watermark and stores
+        them. Returns the number of rows written.
+        """
+        since = max(await self.get_watermark() - RESYNC_WINDOW, 0)
+        cmd: str = """
+        INSERT OR REPLACE INTO event_history
+        (name, utc_start, utc_end, time_start, time_end, element, wiki_page)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """
+        count = 0
+        batch: list = []
+        async with aiosqlite.connect(self.conn) as db:
+            async for row in wiki.iter_event_history(since):
+                batch.append(
+                    (
+                        row["name"],
+                        int(row["utc start"]),
+                        int(row["utc end"] or 0),
+                        row.get("time start", ""),
+                        row.get("time end", ""),
+                        row.get("element", ""),
+                        row.get("wiki page", ""),
+                    )
+                )
+                if len(batch) >= batch_size:
+                    await db.executemany(cmd, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                await db.executemany(cmd, batch)
+                count += len(batch)
+            await db.commit()
+        return count
+
+    async def get_history(self, name: str, limit: int = 50) -> List[Dict[str, str]]:
+        """
+        Gets past runs of events by name, newest first. Names starting with
+        the given text are matched first (using the name index); if there
+        are none, any name containing it is.
+        """
+        cmd: str = """
+        SELECT name, utc_start, utc_end, time_start, time_end, element, wiki_page
+        FROM event_history
+        WHERE name LIKE ?
+        ORDER BY utc_start DESC
+        LIMIT ?;
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            db.row_factory = aiosqlite.Row
+            for pattern in (f"{name}%", f"%{name}%"):
+                async with db.execute(cmd, (pattern, limit)) as cursor:
+                    rows = await cursor.fetchall()
+                if rows:
+                    break
+        return [dict(row) for row in rows]
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# event_publisher.py
+# Publishes gbf.wiki events to the events channel, skipping the Discord
+# edits entirely when nothing has changed since the last publish.
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from discord import Embed, Colour
+from silva.utilities import misc
+from silva.utilities.timeline import Timeline, TimelineEvent
+from typing import Dict, List, Tuple
+import discord
+import pytz
+
+
+class EventPublisher:
+    def __init__(self, bot, announce_new: bool = True):
+        self.bot = bot
+        self.announce_new = announce_new
+        self.db = misc.Database(bot.aliases_conn)
+        # channel id -> (fingerprint, set of event keys) as last published.
+        self.published: Dict[int, Tuple[str, set]] = {}
+
+    def normalize(self, current: list, upcoming: list) -> Dict[str, list]:
+        """
+        Reduces the events to exactly what the embeds show.
+        """
+        return {
+            section: [
+                [event.title, event.url, event.start, event.finish]
+                for event in events
+            ]
+            for section, events in (("current", current), ("upcoming", upcoming))
+        }
+
+    def fingerprint(self, current: list, upcoming: list) -> str:
+        normalized = json.dumps(self.normalize(current, upcoming), sort_keys=True)
+        return hashlib.sha1(normalized.encode()).hexdigest()
+
+    def build_embeds(
+        self, current: List[TimelineEvent], upcoming: List[TimelineEvent]
+    ) -> Tuple[Embed, Embed]:
+        """
+        Builds the current and upcoming events embeds.
+        """
+        now = datetime.utcnow().replace(tzinfo=pytz.utc)
+        msg_current = Embed(
+            title="Granblue Fantasy Current Events",
+            url="https://gbf.wiki",
+            color=Colour.teal(),
+            timestamp=now,
+        )
+        for event in current:
+            msg_current.add_field(
+                name=f"[{event.title}]({event.url})",
+                value=f"Ends on {event.finish}",
+                inline=False,
+            )
+        msg_upcoming = Embed(
+            title="Granblue Fantasy Upcoming Events",
+            url="https://gbf.wiki",
+            color=Colour.dark_purple(),
+            timestamp=now,
+        )
+        for event in upcoming:
+            msg_upcoming.add_field(
+                name=f"[{event.title}]({event.url})",
+                value=f"{event.start} to {event.finish}",
+                inline=False,
+            )
+        return msg_current, msg_upcoming
+
+    async def scan_history(self, channel) -> list:
+        """
+        Finds the bot's pinned current and upcoming events messages by
+        scanning the channel history. Only used when the registered
+        messages can't be fetched.
+        """
+        existing_messages = []
+        async for message in channel.history(limit=200):
+            # Assume the first message to edit is the current events,
+            # and the second message is the upcoming events.
+            if message.author == self.bot.user and message.pinned:
+                existing_messages.append(message)
+            if len(existing_messages) >= 2:
+                break
+        return existing_messages
+
+    async def find_messages(self, channel) -> list:
+        """
+        Finds the bot's current and upcoming events messages in a channel:
+        by their registered IDs first, then by scanning the history.
+        Returns an empty list if they don't exist.
+        """
+        message_ids = await self.db.get_event_messages(channel.id)
+        if message_ids:
+            try:
+                return [await channel.fetch_message(x) for x in message_ids]
+            except discord.HTTPException as e:
+                logging.warning(f"Could not fetch the events messages: {e}")
+        existing_messages = await self.scan_history(channel)
+        if len(existing_messages) < 2:
+            return []
+        existing_messages = existing_messages[:2]
+        await self.db.set_event_messages(
+            channel.id, existing_messages[0].id, existing_messages[1].id
+        )
+        return existing_messages
+
+    async def create_messages(self, channel, msg_current, msg_upcoming):
+        """
+        Posts new events messages, pins them and registers their IDs.
+        """
+        # Post upcoming first so current ends up on top of the pins.
+        upcoming = await channel.send(embed=msg_upcoming)
+        current = await channel.send(embed=msg_current)
+        for message in (upcoming, current):
+            try:
+                await message.pin()
+            except discord.HTTPException as e:
+                logging.warning(f"Could not pin the events message: {e}")
+        await self.db.set_event_messages(channel.id, current.id, upcoming.id)
+
+    async def publish(self, channel, timeline: Timeline) -> bool:
+        """
+        Edits (or posts) the events embeds in a channel if the events differ
+        from what was last published there, and announces any new events.
+        Returns whether anything was sent to Discord.
+        """
+        now = datetime.utcnow().replace(tzinfo=pytz.utc).timestamp()
+        current, upcoming = timeline.split(now)
+        fingerprint = self.fingerprint(current, upcoming)
+        keys = {(event.title, event.utc_start) for event in current + upcoming}
+        previous = self.published.get(channel.id)
+        if previous and previous[0] == fingerprint:
+            logging.info(f"events unchanged in {channel}; skipping the edit.")
+            return False
+        msg_current, msg_upcoming = self.build_embeds(current, upcoming)
+        existing_messages = await self.find_messages(channel)
+        if not existing_messages:
+            await self.create_messages(channel, msg_current, msg_upcoming)
+        else:
+            await existing_messages[0].edit(embed=msg_current)
+            await existing_messages[1].edit(embed=msg_upcoming)
+        # Only announce against a known previous state, so a restart doesn't
+        # announce every event again.
+        if previous and self.announce_new:
+            for event in current + upcoming:
+                if (event.title, event.utc_start) in previous[1]:
+                    continue
+                msg = (
+                    f"New event announced: **{event.title}**,"
+                    f" {event.start} to {event.finish}. {event.url}"
+                )
+                await channel.send(msg)
+        self.published[channel.id] = (fingerprint, keys)
+        return True
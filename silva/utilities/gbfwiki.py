@@ -1,25 +1,88 @@
 #!/usr/bin/env python
 
 import pytz
+import asyncio
+import logging
+import time
 from datetime import datetime
-import aiohttp
-from bs4 import BeautifulSoup, element
+from bs4 import BeautifulSoup, SoupStrainer, element
 from copy import copy
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict
+from silva.utilities import html_parsing, mediawiki
+from silva.utilities.http_client import HttpClient
+from silva.utilities.page_cache import PageCache
+from silva.utilities.timeline import Timeline, TimelineEvent
 
 
-async def init_wiki():
+async def init_wiki(client: HttpClient):
     """
     Async-creates the wiki object and sets its .soup to actual JSON.
+    :param client (HttpClient): the bot's shared HTTP client.
     return: gbfwiki.wiki wiki
     """
-    wiki = Wiki()
+    wiki = Wiki(client)
     await wiki._init()
     return wiki
 
 
+class EventCache:
+    """
+    Keeps the last good event data from gbf.wiki around. Once it's older than
+    ttl seconds, callers still get it right away while a refresh runs in the
+    background. Concurrent callers share a single in-flight fetch.
+    """
+
+    def __init__(self, client: HttpClient, ttl: int = 300):
+        self.client = client
+        self.ttl = ttl
+        self.wiki = None
+        self.fetched_at = 0.0
+        self._refresh_task = None
+
+    async def get(self):
+        """
+        Returns a Wiki with event data, only waiting on the network if
+        nothing has been fetched yet.
+        return: gbfwiki.Wiki wiki
+        """
+        if self.wiki is None:
+            return await self.refresh()
+        if time.monotonic() - self.fetched_at > self.ttl:
+            self._start_refresh()
+        return self.wiki
+
+    async def refresh(self):
+        """
+        Fetches fresh event data (or joins a fetch already in flight) and
+        waits for it.
+        return: gbfwiki.Wiki wiki
+        """
+        # Shield the shared task so one caller being cancelled doesn't
+        # cancel the fetch for everyone else.
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._fetch())
+            self._refresh_task.add_done_callback(self._log_failure)
+        return self._refresh_task
+
+    async def _fetch(self):
+        wiki = await init_wiki(self.client)
+        self.wiki = wiki
+        self.fetched_at = time.monotonic()
+        return wiki
+
+    def _log_failure(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logging.warning(f"Could not refresh events: {task.exception()}")
+
+
 class Wiki:
-    def __init__(self):
+    def __init__(self, client: HttpClient, page_cache: PageCache = None):
+        self.client = client
+        self.page_cache = page_cache
+        self.timeline = None
         self.base_url = "https://gbf.wiki"
         self.url = f"{self.base_url}/api.php"
         self.headers = {
@@ -41,16 +104,49 @@ class Wiki:
             "where": "(time_start >= NOW()) OR time_end >= NOW()",
         }
         headers = self.headers
-        async with aiohttp.ClientSession() as session:
+        try:
+            text = await self.client.get_json(
+                self.url, params=params, headers=headers
+            )
+            json_output = text["cargoquery"]
+        except Exception as e:
+            raise (self.UnreachableWikiError(e))
+        return json_output
+
+    async def iter_event_history(
+        self, since: int = 0, limit: int = 500
+    ) -> AsyncIterator[Dict[str, str]]:
+        """
+        Streams every event_history row starting at or after a UTC
+        timestamp, oldest first, a page of rows at a time.
+        since: the utc_start to start from.
+        """
+        offset = 0
+        while True:
+            params: dict = {
+                "action": "cargoquery",
+                "format": "json",
+                "tables": "event_history",
+                "fields": "name, utc_end, utc_start, time_start, time_end,"
+                " element, wiki_page",
+                "where": f"utc_start >= {int(since)}",
+                "order_by": "utc_start, name",
+                "limit": limit,
+                "offset": offset,
+                "maxlag": 5,
+            }
             try:
-                async with session.get(
-                    self.url, params=params, headers=headers
-                ) as resp:
-                    text = await resp.json()
+                text = await self.client.get_json(
+                    self.url, params=params, headers=self.headers
+                )
+                rows = text["cargoquery"]
             except Exception as e:
                 raise (self.UnreachableWikiError(e))
-        json_output = text["cargoquery"]
-        return json_output
+            for row in rows:
+                yield row["title"]
+            if len(rows) < limit:
+                return
+            offset += limit
 
     async def get_main_page_special(self):
         """
@@ -63,69 +159,75 @@ class Wiki:
             "prop": "text",
         }
         headers = self.headers
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(
-                    self.url, params=params, headers=headers
-                ) as resp:
-                    text = await resp.json()
-            except Exception as e:
-                raise (self.UnreachableWikiError(e))
-        text_output = text["parse"]["text"]["*"]
-        html_output = BeautifulSoup(text_output, "html.parser")
+        try:
+            text = await self.client.get_json(
+                self.url, params=params, headers=headers
+            )
+            text_output = text["parse"]["text"]["*"]
+        except Exception as e:
+            raise (self.UnreachableWikiError(e))
+        # The special events are found by walking up from their countdown
+        # spans, so this template is parsed whole; it's small.
+        html_output = await html_parsing.parse(text_output)
         return html_output
 
-    def get_events(self):
+    def get_timeline(self) -> Timeline:
         """
-        Scrapes the soup for events and sorts them into upcoming and
-        current events.
-        return: dict events
+        Builds the event timeline out of the event_history rows and the
+        special events. Built once per fetch, then reused.
+        return: timeline.Timeline timeline
         """
+        if self.timeline is not None:
+            return self.timeline
         soup: dict = self.soup
-        events: dict = {"upcoming": [], "current": []}
-        now: datetime.datetime = datetime.utcnow().replace(tzinfo=pytz.utc)
+        events: list = []
         for span in soup:
-            event: dict = {}
-            event["title"] = span["title"]["name"]
-            event["start"] = span["title"]["time start"]
-            try:
-                if span["title"]["time end"] != "":
-                    event["finish"] = span["title"]["time end"]
-                else:
-                    event["finish"] = "¯\_(ツ)_/¯"  # noqa
-            except KeyError:
-                event["finish"] = "¯\_(ツ)_/¯"  # noqa
-            event["utc start"] = int(span["title"]["utc start"])
-            event["utc end"] = int(span["title"]["utc end"])
-            try:
-                if span["title"]["element"] != "":
-                    event["title"] += f" ({span['title']['element']})"
-            except KeyError:
-                pass
-            try:
-                if span["title"]["wiki page"] != "":
-                    url = f"{self.base_url}/{span['title']['wiki page']}".replace(" ", "_")
-                    event["url"] = url
-                else:
-                    event["url"] = "No wiki page"
-            except KeyError:
-                event["url"] = "No wiki page"
-            if datetime.fromtimestamp(int(span["title"]["utc start"]), pytz.utc) <= now:
-                events["current"].append(event)
+            row = span["title"]
+            title = row["name"]
+            finish = row.get("time end", "")
+            if finish == "":
+                finish = "¯\_(ツ)_/¯"  # noqa
+            if row.get("element", "") != "":
+                title += f" ({row['element']})"
+            if row.get("wiki page", "") != "":
+                url = f"{self.base_url}/{row['wiki page']}".replace(" ", "_")
             else:
-                events["upcoming"].append(event)
-        special_events = self.get_special_events()
-        for event in special_events:
-            start = datetime.fromtimestamp(event["utc start"], pytz.utc)
-            end = datetime.fromtimestamp(event["utc end"], pytz.utc)
-            if start <= now:
-                if end > now:
-                    events["current"].append(event)
-            else:
-                events["upcoming"].append(event)
-        events["current"] = sorted(events["current"], key=lambda k: k["utc start"])
-        events["upcoming"] = sorted(events["upcoming"], key=lambda k: k["utc start"])
-        return events
+                url = "No wiki page"
+            events.append(
+                TimelineEvent(
+                    title,
+                    row["time start"],
+                    finish,
+                    int(row["utc start"]),
+                    int(row["utc end"]),
+                    url,
+                )
+            )
+        for event in self.get_special_events():
+            events.append(
+                TimelineEvent(
+                    event["title"],
+                    event["start"],
+                    event["finish"],
+                    event["utc start"],
+                    event["utc end"],
+                    event["url"],
+                )
+            )
+        self.timeline = Timeline(events)
+        return self.timeline
+
+    def get_events(self):
+        """
+        Sorts the timeline into upcoming and current events.
+        return: dict events
+        """
+        now = datetime.utcnow().replace(tzinfo=pytz.utc).timestamp()
+        current, upcoming = self.get_timeline().split(now)
+        return {
+            "upcoming": [event.as_dict() for event in upcoming],
+            "current": [event.as_dict() for event in current],
+        }
 
     def get_special_events(self) -> List[element.Tag]:
         soup = self.main_page_special
@@ -149,39 +251,52 @@ class Wiki:
             events.append(event)
         return events
 
-    async def _get_wikimedia_query_api(self, cmpageid: int) -> Dict[str, str]:
-        """ Gets full list of category members based on numeric cmpageid
-        input. Requests for maximum number of entries. Returns list of JSON
-        of entries. """
+    async def iter_category_members(
+        self, cmpageid: int = None, cmtitle: str = None, cmtype: str = "page"
+    ) -> AsyncIterator[Dict[str, str]]:
+        """
+        Streams the members of a category, given either its numeric page ID
+        or its title. Follows continuation, so categories of any size come
+        back in full, one page of results at a time.
+        """
         params = {
             "action": "query",
             "list": "categorymembers",
             "format": "json",
-            "cmpageid": cmpageid,
-            "cmtype": "page",
+            "cmtype": cmtype,
             "cmlimit": "max",
+            "maxlag": 5,
         }
+        if cmpageid is not None:
+            params["cmpageid"] = cmpageid
+        else:
+            params["cmtitle"] = cmtitle
         headers: dict = {
             "User-Agent": "Granblue SA Silva Bot (Written by Hail Hydrate#9035)",
             "Accept": "application/json",
         }
-        url = self.url
-        async with aiohttp.ClientSession() as session:
-            async_res = await session.get(
-                url, headers=headers, params=params, timeout=10
-            )
-        # The default return also returns batchcomplete information.
-        # We don't care, so we only return the category's members.
-        res = await async_res.json()
-        return res["query"]["categorymembers"]
+        try:
+            async for member in mediawiki.iter_query(
+                self.client, self.url, params, "categorymembers", headers=headers
+            ):
+                yield member
+        except Exception as e:
+            raise (self.UnreachableWikiError(e))
+
+    async def _get_wikimedia_query_api(self, cmpageid: int) -> Dict[str, str]:
+        """ Gets full list of category members based on numeric cmpageid
+        input. Requests for maximum number of entries. Returns list of JSON
+        of entries. """
+        return [member async for member in self.iter_category_members(cmpageid)]
 
     async def get_summons_page(self):
         """
         Gets the summons page and removes the Summons List pages.
         """
-        summons_full = await self._get_wikimedia_query_api(12225)
         summons = [
-            summon for summon in summons_full if "Summons List" not in summon["title"]
+            summon
+            async for summon in self.iter_category_members(12225)
+            if "Summons List" not in summon["title"]
         ]
         return summons
 
@@ -190,25 +305,131 @@ class Wiki:
         Retrieves a page by page ID.
         """
         params = {"action": "parse", "pageid": pageid, "format": "json"}
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(
-                    self.url, params=params, headers=self.headers
-                ) as resp:
-                    text = await resp.json()
-            except Exception as e:
-                raise (self.UnreachableWikiError(e))
-            if "error" in text.keys():
-                raise self.NoPageFound(f"Page {pageid} not found.")
+        try:
+            text = await self.client.get_json(
+                self.url, params=params, headers=self.headers
+            )
+        except Exception as e:
+            raise (self.UnreachableWikiError(e))
+        if "error" in text.keys():
+            raise self.NoPageFound(f"Page {pageid} not found.")
         return text
 
-    async def get_page_text(self, pageid: int, key: str = "*") -> str:
+    async def get_revision(self, pageid: int) -> int:
+        """
+        Gets the latest revision ID of a page. Much cheaper than parsing
+        the page, so it's used to check whether a cached page is stale.
+        """
+        params = {
+            "action": "query",
+            "prop": "info",
+            "pageids": pageid,
+            "format": "json",
+        }
+        try:
+            text = await self.client.get_json(
+                self.url, params=params, headers=self.headers
+            )
+        except Exception as e:
+            raise (self.UnreachableWikiError(e))
+        try:
+            page = text["query"]["pages"][str(pageid)]
+        except KeyError:
+            raise self.NoPageFound(f"Page {pageid} not found.")
+        if "missing" in page.keys():
+            raise self.NoPageFound(f"Page {pageid} not found.")
+        return page["lastrevid"]
+
+    async def iter_revisions(
+        self,
+        pageids: List[int],
+        content: bool = False,
+        batch_size: int = 50,
+        concurrency: int = 4,
+    ) -> AsyncIterator[Dict[str, str]]:
+        """
+        Streams the latest revision of many pages, fetched batch_size page
+        IDs per request (50 is MediaWiki's limit) with at most concurrency
+        requests in flight. Pages are yielded as their batch completes, so
+        order isn't preserved. Missing pages are skipped.
+        content: also fetch each page's wikitext.
+        Yields dicts of pageid, title, revid and (optionally) content.
+        """
+        pageids = list(dict.fromkeys(pageids))
+        batches = [
+            pageids[i:i + batch_size] for i in range(0, len(pageids), batch_size)
+        ]
+        rvprop = "ids|content" if content else "ids"
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_batch(batch: List[int]) -> dict:
+            params = {
+                "action": "query",
+                "prop": "revisions",
+                "rvprop": rvprop,
+                "rvslots": "main",
+                "pageids": "|".join(str(pageid) for pageid in batch),
+                "format": "json",
+                "maxlag": 5,
+            }
+            async with semaphore:
+                try:
+                    text = await self.client.get_json(
+                        self.url, params=params, headers=self.headers
+                    )
+                    return text["query"]["pages"]
+                except Exception as e:
+                    raise (self.UnreachableWikiError(e))
+
+        tasks = [asyncio.ensure_future(fetch_batch(batch)) for batch in batches]
+        try:
+            for task in asyncio.as_completed(tasks):
+                pages = await task
+                for page in pages.values():
+                    if "missing" in page.keys() or "revisions" not in page.keys():
+                        continue
+                    revision = page["revisions"][0]
+                    result = {
+                        "pageid": page["pageid"],
+                        "title": page["title"],
+                        "revid": revision["revid"],
+                    }
+                    if content:
+                        result["content"] = revision["slots"]["main"]["*"]
+                    yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_revisions(self, pageids: List[int]) -> Dict[int, int]:
+        """
+        Gets the latest revision IDs of many pages in as few requests as
+        possible, keyed by page ID.
+        """
+        return {
+            page["pageid"]: page["revid"]
+            async for page in self.iter_revisions(pageids)
+        }
+
+    async def get_page_text(
+        self, pageid: int, key: str = "*", revid: int = None
+    ) -> str:
         """
         Gets page text from parsed results of a page.
+        If the wiki has a page cache, the page is only re-parsed when its
+        revision has changed since it was cached.
         key: page['parse']['text'][key]. defaults to '*'.
         pageid: the page ID.
+        revid: the page's latest revision ID, if the caller already knows it.
         returns the text.
         """
+        cache = self.page_cache if key == "*" else None
+        if cache:
+            if revid is None:
+                revid = await self.get_revision(pageid)
+            cached = await cache.get_page(pageid)
+            if cached and cached["revid"] == revid:
+                return cached["text"]
         page = await self.get_page(pageid)
         if "parse" not in page.keys():
             raise self.NoPageFound(f"Page ID {pageid} has no parsed results.")
@@ -216,17 +437,31 @@ class Wiki:
             raise self.NoPageFound(f"Page ID {pageid} has no parsable text.")
         if key not in page["parse"]["text"].keys():
             raise self.NoPageFound(f"Page ID {pageid} does not have the key {key}.")
-        return page["parse"]["text"][key]
+        text = page["parse"]["text"][key]
+        if cache:
+            await cache.set_page(
+                pageid, page["parse"]["revid"], page["parse"]["title"], text
+            )
+        return text
 
-    async def get_page_soup(self, pageid: int, key: str = "*") -> BeautifulSoup:
+    async def get_page_soup(
+        self,
+        pageid: int,
+        key: str = "*",
+        revid: int = None,
+        parse_only: SoupStrainer = None,
+    ) -> BeautifulSoup:
         """
         Transforms the page text into a BeautifulSoup HTML object.
+        Parsing happens off the event loop.
         key: page['parse']['text'][key]. defaults to '*'.
         pageid: the page ID.
+        revid: the page's latest revision ID, if the caller already knows it.
+        parse_only: only parse the parts of the page this strainer matches.
         returns the text.
         """
-        text = await self.get_page_text(pageid, key)
-        soup = BeautifulSoup(text, "html.parser")
+        text = await self.get_page_text(pageid, key, revid)
+        soup = await html_parsing.parse(text, parse_only)
         return soup
 
     async def get_summon_name(self, page: BeautifulSoup) -> str:
@@ -270,40 +505,73 @@ class Wiki:
             )
         return page.find(text="Second Half").find_next("td").text
 
-    async def get_combo_name(self, summon1: int, summon2: int) -> str:
+    async def get_summon_info(self, page: BeautifulSoup) -> Dict[str, str]:
         """
-        Gets the combo call name of two summons.
-        If a summon doesn't have a combo name recorded (Illuyanka),
-        return one of the summons' call name.
-        If the first summon doesn't have a first half (Arcarum summons),
-        make it the second half.
-        If both summons are uncrossable (no combo name or no first half),
-        raise an uncrossable exception.
-        summon1 and summon2 are the page IDs to search.
-        Return the call name.
+        Gets the name, call name and both combo call halves of a summon in
+        one pass. Anything the page doesn't have is None.
         """
-        s1 = await self.get_page_soup(summon1)
-        s2 = await self.get_page_soup(summon2)
+        info: dict = {"name": await self.get_summon_name(page)}
         try:
-            s1_first = await self.get_summon_first_half(s1)
-        except (self.NoFirstHalfCombo, self.NoPageFound):
-            s1_first = None
+            info["call"] = await self.get_summon_call(page)
+        except (self.NoPageFound, IndexError):
+            info["call"] = None
         try:
-            s2_first = await self.get_summon_first_half(s2)
+            info["first_half"] = await self.get_summon_first_half(page)
         except (self.NoFirstHalfCombo, self.NoPageFound):
-            s2_first = None
-        if not s1_first and not s2_first:
-            raise self.UncrossableSummonsException
+            info["first_half"] = None
         try:
-            s1_second = await self.get_summon_second_half(s1)
-            s2_second = await self.get_summon_second_half(s2)
+            info["second_half"] = await self.get_summon_second_half(page)
         except self.NoPageFound:
+            info["second_half"] = None
+        return info
+
+    def combine_halves(
+        self, s1_first: str, s1_second: str, s2_first: str, s2_second: str
+    ) -> str:
+        """
+        Builds a combo call name out of the halves of two summons.
+        See get_combo_name for the rules.
+        """
+        if not s1_first and not s2_first:
+            raise self.UncrossableSummonsException
+        if s1_second is None or s2_second is None:
             raise self.UncrossableSummonsException
         if s1_first:
             return f"{s1_first} {s2_second}"
         else:
             return f"{s2_first} {s1_second}"
 
+    async def get_combo_name(self, summon1: int, summon2: int) -> str:
+        """
+        Gets the combo call name of two summons.
+        If a summon doesn't have a combo name recorded (Illuyanka),
+        return one of the summons' call name.
+        If the first summon doesn't have a first half (Arcarum summons),
+        make it the second half.
+        If both summons are uncrossable (no combo name or no first half),
+        raise an uncrossable exception.
+        summon1 and summon2 are the page IDs to search.
+        Return the call name.
+        """
+        strainer = html_parsing.SUMMON_STRAINER
+        revisions: dict = {}
+        if self.page_cache:
+            # One request checks both pages' revisions against the cache.
+            revisions = await self.get_revisions([summon1, summon2])
+        s1 = await self.get_summon_info(
+            await self.get_page_soup(
+                summon1, revid=revisions.get(summon1), parse_only=strainer
+            )
+        )
+        s2 = await self.get_summon_info(
+            await self.get_page_soup(
+                summon2, revid=revisions.get(summon2), parse_only=strainer
+            )
+        )
+        return self.combine_halves(
+            s1["first_half"], s1["second_half"], s2["first_half"], s2["second_half"]
+        )
+
     def get_upcoming_events_html(self) -> List[element.Tag]:
         """
         Scrapes the soup for a elements to identify
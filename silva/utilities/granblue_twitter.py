@@ -3,8 +3,9 @@
 # A collection of utilities to get tweet information from
 # @Granblue_en.
 
-import logging
 import asyncio
+import discord
+import logging
 from silva.utilities.misc import TwitterDatabase
 
 
@@ -17,31 +18,66 @@ class Twitter(object):
         twitter_database_host: str,
         twitter_database_username: str,
         twitter_database_password: str,
-        twitter_usernames: str
+        twitter_usernames: str,
+        poll_interval: int = 300,
+        retention_months: int = 12,
+        unread_retention_months: int = 24,
     ):
         self.bot = bot
         self.channel_id = int(discord_channel_id)
         self.twitter_connection = f"user={twitter_database_username} password={twitter_database_password} dbname={twitter_database_db} host={twitter_database_host}"
         self.twitter_usernames = twitter_usernames
+        # New tweets are pushed by Postgres; this is only a fallback in case
+        # a notification is lost.
+        self.poll_interval = poll_interval
+        self.retention_months = retention_months
+        self.unread_retention_months = unread_retention_months
         self.client = None
 
+    async def maintain(self, interval: int = 24):
+        """
+        Creates upcoming tweets partitions and drops the ones past retention.
+        :interval (int): The interval in hours between runs.
+        """
+        while True:
+            try:
+                await self.client.create_tweet_partitions()
+                dropped = await self.client.enforce_tweet_retention(
+                    self.retention_months, self.unread_retention_months
+                )
+                logging.info(f"tweets maintained; {dropped} partitions dropped.")
+            except Exception as e:
+                logging.warning(f"Could not maintain the tweets table: {e}")
+            await asyncio.sleep(interval * 3600)
+
     async def follow(self):
         if not self.bot.is_following:
             self.bot.is_following = True
             self.client = await TwitterDatabase.create(self.twitter_connection)
+            asyncio.get_event_loop().create_task(self.maintain())
             bot = self.bot
             channel = bot.get_channel(self.channel_id)
             while True:
-                for username in self.twitter_usernames:
-                    tweets = await self.client.get_unread_tweets(username)
+                await self.client.wait_for_tweets(self.poll_interval)
+                tweets = await self.client.get_unread_tweets_for(
+                    self.twitter_usernames
+                )
+                # Only what actually reached Discord (or was muted) is marked
+                # read, so a failed send is retried on the next pass.
+                handled: list = []
+                try:
                     for tweet in tweets:
+                        username = tweet["username"]
                         sid = tweet["tweet_id"]
                         logging.info(f"@{username}: {sid}")
                         url = f"https://fxtwitter.com/{username}/status/{sid}"
                         logging.info(url)
-                        if not await self.client.check_muted_user(username):
+                        if not self.client.check_muted_user(username):
                             await channel.send(url)
                         else:
                             logging.info(f"Ignoring {username}")
-                        await self.client.mark_tweet_read(username, sid)
-                await asyncio.sleep(5)
\ No newline at end of file
+                        handled.append((username, sid))
+                except discord.HTTPException as e:
+                    logging.warning(f"Could not post a tweet: {e}")
+                finally:
+                    await self.client.mark_tweets_read(handled)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# html_parsing.py
+# Parses wiki HTML in a worker thread, with the fastest installed
+# BeautifulSoup backend and, where callers allow it, only the parts of the
+# page they actually read.
+
+import asyncio
+import functools
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+
+def _class_list(attrs) -> list:
+    classes = attrs.get("class", "")
+    if isinstance(classes, str):
+        classes = classes.split()
+    return classes
+
+
+def _summon_parts(name: str, attrs: dict = None) -> bool:
+    """
+    Keeps the summon name and every top-level table (call and combo call
+    information live in tables).
+    """
+    if attrs is None:
+        # Newer BeautifulSoup releases only pass the tag name, so fall back
+        # to keeping anything that could hold what we need.
+        return name in ("table", "div")
+    if name == "table":
+        return True
+    return name == "div" and "char-name" in _class_list(attrs)
+
+
+def _weapon_parts(name: str, attrs: dict = None) -> bool:
+    """
+    Keeps the weapon infobox, which holds the flavor text table.
+    """
+    if attrs is None:
+        return name == "div"
+    return name == "div" and "weapon" in _class_list(attrs)
+
+
+SUMMON_STRAINER = SoupStrainer(_summon_parts)
+WEAPON_STRAINER = SoupStrainer(_weapon_parts)
+
+
+def parse_sync(
+    text: str, parse_only: SoupStrainer = None, parser: str = PARSER
+) -> BeautifulSoup:
+    """
+    Parses HTML on the calling thread.
+    """
+    return BeautifulSoup(text, parser, parse_only=parse_only)
+
+
+async def parse(text: str, parse_only: SoupStrainer = None) -> BeautifulSoup:
+    """
+    Parses HTML in the default executor so large pages don't stall the
+    event loop (and with it, the Discord gateway heartbeat).
+    :param parse_only (SoupStrainer): only keep the subtrees this matches.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(parse_sync, text, parse_only)
+    )
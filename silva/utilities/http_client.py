@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# http_client.py
+# A single, long-lived HTTP client shared by every outbound request the
+# bot makes, so commands reuse pooled keep-alive connections instead of
+# paying a fresh TCP+TLS handshake each time. It also keeps the bot polite:
+# requests to rate-limited hosts go through a per-host token bucket, and
+# failed or throttled requests are retried with jittered backoff. Background
+# crawls share the buckets but never take the tokens kept for commands.
+
+import asyncio
+import copy
+import json
+import logging
+import random
+import time
+import aiohttp
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Tuple
+from urllib.parse import urlsplit
+
+# host: (requests per second, burst size)
+RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    "gbf.wiki": (2, 5),
+    "commons.wikimedia.org": (5, 10),
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class Response(NamedTuple):
+    status: int
+    headers: Any
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int, reserve: int = None):
+        """
+        :param reserve (int): tokens background requests leave untouched, so
+            interactive requests can always burst. Defaults to half the
+            capacity.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = capacity // 2 if reserve is None else reserve
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.background_lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    async def acquire(self, background: bool = False):
+        """
+        Waits until a request may be made, then takes a token. Background
+        requests wait while an interactive one is waiting, and never dip
+        into the reserve.
+        """
+        if not background:
+            async with self.lock:
+                while True:
+                    self.refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        async with self.background_lock:
+            while True:
+                self.refill()
+                needed = 1 + self.reserve
+                if not self.lock.locked() and self.tokens >= needed:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep(max(needed - self.tokens, 1) / self.rate)
+
+
+class HttpClient:
+    @classmethod
+    async def create(
+        cls,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        dns_ttl: int = 300,
+        timeout: int = 10,
+        rate_limits: Dict[str, Tuple[float, int]] = None,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        max_delay: float = 30.0,
+        max_retry_after: float = 600.0,
+    ):
+        """
+        Async-creates the client. Must be called from within a running
+        event loop.
+        :param limit (int): maximum number of pooled connections overall.
+        :param limit_per_host (int): maximum connections to a single host.
+        :param dns_ttl (int): seconds to cache DNS lookups for.
+        :param timeout (int): default total timeout for a request, in seconds.
+        :param rate_limits (dict): host to (requests per second, burst).
+            Defaults to RATE_LIMITS. Hosts not listed aren't throttled.
+        :param max_retries (int): retries for failed or throttled requests.
+        :param backoff (float): base delay, in seconds, between retries.
+        :param max_delay (float): the longest a backoff retry will wait.
+        :param max_retry_after (float): the longest we'll wait when the server
+            asks for it with Retry-After. Asking for longer raises Throttled.
+        """
+        self = HttpClient()
+        try:
+            # aiodns, if installed, keeps DNS resolution off the default
+            # thread pool.
+            resolver = aiohttp.AsyncResolver()
+        except RuntimeError:
+            logging.info("aiodns not installed; using the default resolver.")
+            resolver = aiohttp.DefaultResolver()
+        connector = aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            ttl_dns_cache=dns_ttl,
+            resolver=resolver,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)
+        )
+        if rate_limits is None:
+            rate_limits = RATE_LIMITS
+        self.buckets = {
+            host: TokenBucket(rate, burst)
+            for host, (rate, burst) in rate_limits.items()
+        }
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.background = False
+        return self
+
+    class Throttled(Exception):
+        pass
+
+    def as_background(self) -> "HttpClient":
+        """
+        Returns a client sharing this one's connections and rate limits whose
+        requests yield to interactive ones. For crawls and other scheduled
+        jobs; don't close it, close the original.
+        """
+        client = copy.copy(self)
+        client.background = True
+        return client
+
+    def get_delay(self, attempt: int, resp: Response = None) -> float:
+        """
+        How long to wait before retrying: the server's Retry-After if it
+        sent one, otherwise exponential backoff with full jitter.
+        Servers are always given at least what they asked for.
+        """
+        retry_after = resp.headers.get("Retry-After") if resp else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after)
+                    delay = (when - datetime.now(when.tzinfo)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = self.backoff
+            return max(delay, 0)
+        return random.uniform(0, min(self.max_delay, self.backoff * 2 ** attempt))
+
+    def should_retry(self, resp: Response) -> bool:
+        if resp.status in RETRY_STATUSES:
+            return True
+        # MediaWiki answers 200 with this header when replicas are lagging
+        # behind the maxlag parameter.
+        return resp.headers.get("MediaWiki-API-Error") == "maxlag"
+
+    async def get(self, url: str, **kwargs) -> Response:
+        """
+        Performs a GET request and reads the whole body, retrying on
+        connection errors, 429/5xx responses and MediaWiki maxlag errors.
+        Takes the same keyword arguments as aiohttp.ClientSession.get.
+        """
+        bucket = self.buckets.get(urlsplit(url).hostname)
+        for attempt in range(self.max_retries + 1):
+            if bucket:
+                await bucket.acquire(self.background)
+            try:
+                async with self.session.get(url, **kwargs) as resp:
+                    body = await resp.read()
+                    response = Response(resp.status, resp.headers, body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.get_delay(attempt)
+                logging.info(f"GET {url} failed ({e!r}); retrying in {delay:.1f}s.")
+            else:
+                if attempt == self.max_retries or not self.should_retry(response):
+                    return response
+                delay = self.get_delay(attempt, response)
+                if delay > self.max_retry_after:
+                    raise self.Throttled(
+                        f"GET {url} returned {response.status} and asked us to"
+                        f" wait {delay:.0f}s."
+                    )
+                logging.info(
+                    f"GET {url} returned {response.status}; retrying in {delay:.1f}s."
+                )
+            await asyncio.sleep(delay)
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        """
+        Performs a GET request and returns the decoded JSON body.
+        """
+        resp = await self.get(url, **kwargs)
+        return resp.json()
+
+    async def close(self):
+        """
+        Closes the pooled connections. Call once on shutdown.
+        """
+        if not self.session.closed:
+            await self.session.close()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# ingester.py
+# Scrapes the followed twitter accounts with snscrape and writes new tweets
+# to Postgres. One long-running process: scrapers run as async subprocesses
+# with bounded concurrency, and each pass is written in a single batch.
+
+import asyncio
+import json
+import logging
+import psycopg
+from collections import OrderedDict
+from datetime import datetime
+from psycopg_pool import AsyncConnectionPool
+from typing import Any, Dict, List, Optional, Tuple
+
+# Lines of snscrape's JSONL output can be much longer than asyncio's 64 KiB
+# default line limit.
+LINE_LIMIT = 2 ** 20
+
+Row = Tuple[str, int, datetime, List[str]]
+
+
+class SeenCache:
+    """
+    A bounded set of recently seen (username, status_id) pairs, evicting the
+    least recently seen first.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.items: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key: Tuple[str, int]) -> bool:
+        if key in self.items:
+            self.items.move_to_end(key)
+            return True
+        return False
+
+    def add(self, key: Tuple[str, int]):
+        self.items[key] = None
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+
+class Ingester:
+    def __init__(
+        self,
+        conn: str,
+        usernames: List[str],
+        concurrency: int = 4,
+        count: int = 10,
+        interval: float = 2,
+        seen_size: int = 10000,
+    ):
+        """
+        :param conn (str): the Postgres connection string.
+        :param usernames (list): the twitter handles to scrape.
+        :param concurrency (int): how many snscrape processes may run at once.
+        :param count (int): how many of the latest tweets to scrape for an
+            account seen for the first time.
+        :param interval (float): seconds to wait between passes.
+        :param seen_size (int): how many known tweets to remember, so they're
+            dropped before reaching the database.
+        """
+        self.conn = AsyncConnectionPool(conn)
+        self.usernames = usernames
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.count = count
+        self.interval = interval
+        # username -> the newest status_id stored for that account.
+        self.watermarks: Dict[str, int] = {}
+        self.seen = SeenCache(seen_size)
+
+    def to_row(self, tweet: Dict[str, Any]) -> Row:
+        """
+        Turns a tweet from snscrape's JSONL output into a tweets row.
+        """
+        return (
+            tweet["user"]["username"],
+            int(tweet["id"]),
+            datetime.fromisoformat(tweet["date"]),
+            tweet.get("hashtags"),
+        )
+
+    def get_args(self, username: str) -> List[str]:
+        """
+        The snscrape command for an account: every tweet newer than its
+        watermark if it has one (however many that is), otherwise just the
+        latest few.
+        """
+        watermark = self.watermarks.get(username)
+        if watermark is None:
+            scraper = ["-n", str(self.count), "twitter-user", username]
+        else:
+            query = f"from:{username} since_id:{watermark}"
+            scraper = ["twitter-search", query]
+        return ["snscrape", "--retry", "3", "--jsonl"] + scraper
+
+    async def scrape(self, username: str) -> Tuple[List[Row], bool]:
+        """
+        Runs snscrape for one account and parses its output as it streams in,
+        stopping as soon as it reaches tweets we already have.
+        Returns the tweets and whether the scrape got everything since the
+        watermark; if it didn't, the watermark mustn't move past the gap.
+        """
+        args = self.get_args(username)
+        watermark = self.watermarks.get(username, 0)
+        rows: list = []
+        reached = False
+        async with self.semaphore:
+            proc = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE, limit=LINE_LIMIT
+            )
+            try:
+                async for line in proc.stdout:
+                    try:
+                        row = self.to_row(json.loads(line))
+                    except (ValueError, KeyError, TypeError) as e:
+                        logging.warning(f"Skipping a tweet from {username}: {e!r}")
+                        continue
+                    # Search results come newest first.
+                    if watermark and row[1] <= watermark:
+                        reached = True
+                        break
+                    rows.append(row)
+            finally:
+                # Let a scrape that ran to the end exit on its own, so its
+                # exit code says whether it really finished.
+                if proc.returncode is None and not proc.stdout.at_eof():
+                    try:
+                        proc.kill()
+                    except ProcessLookupError:
+                        pass
+                await proc.wait()
+        complete = reached or proc.returncode == 0
+        if not complete:
+            logging.warning(f"snscrape exited with {proc.returncode} for {username}.")
+        return rows, complete
+
+    async def load_watermarks(self):
+        cmd: str = """
+        SELECT username, status_id FROM tweet_watermarks
+        """
+        async with self.conn.connection() as db:
+            cur = await db.execute(cmd)
+            self.watermarks = {row[0]: row[1] for row in await cur.fetchall()}
+        return
+
+    async def load_seen(self):
+        """
+        Warms the seen cache with the newest stored tweets of every account.
+        """
+        cmd: str = """
+        SELECT username, status_id FROM (
+            SELECT username, status_id, date FROM tweets
+            WHERE username = ANY(%s)
+            ORDER BY date DESC
+            LIMIT %s
+        ) AS newest
+        ORDER BY date ASC
+        """
+        async with self.conn.connection() as db:
+            # Oldest first, so the newest tweets are the last to be evicted.
+            cur = await db.execute(cmd, (self.usernames, self.seen.maxsize))
+            for username, status_id in await cur.fetchall():
+                self.seen.add((username, status_id))
+        return
+
+    async def write(self, rows: List[Row], watermarks: Dict[str, int]):
+        """
+        Inserts a batch of tweets and advances the accounts' watermarks in
+        one transaction, skipping known tweets.
+        """
+        cmd: str = """
+        INSERT INTO tweets (username, status_id, date, silva_read, hashtags)
+        VALUES (%s, %s, %s, false, %s)
+        ON CONFLICT (username, status_id, date) DO NOTHING
+        """
+        watermark_cmd: str = """
+        INSERT INTO tweet_watermarks (username, status_id)
+        VALUES (%s, %s)
+        ON CONFLICT (username)
+        DO UPDATE SET status_id = GREATEST(tweet_watermarks.status_id, excluded.status_id)
+        """
+        if not rows and not watermarks:
+            return
+        async with self.conn.connection() as db:
+            async with db.cursor() as cur:
+                if rows:
+                    await cur.executemany(cmd, rows)
+                await cur.executemany(watermark_cmd, watermarks.items())
+        for username, status_id in watermarks.items():
+            self.watermarks[username] = max(
+                status_id, self.watermarks.get(username, 0)
+            )
+        return
+
+    async def run_once(self) -> int:
+        """
+        Scrapes every account and writes what wasn't already known.
+        Returns the number of tweets sent to the database.
+        """
+        results = await asyncio.gather(
+            *[self.scrape(username) for username in self.usernames],
+            return_exceptions=True,
+        )
+        rows: list = []
+        watermarks: dict = {}
+        for username, result in zip(self.usernames, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Could not scrape {username}: {result!r}")
+                continue
+            scraped, complete = result
+            rows.extend(row for row in scraped if (row[0], row[1]) not in self.seen)
+            if scraped and complete:
+                watermarks[username] = max(row[1] for row in scraped)
+        await self.write(rows, watermarks)
+        for row in rows:
+            self.seen.add((row[0], row[1]))
+        return len(rows)
+
+    async def wait_for_schema(self, retry: float = 5):
+        """
+        Waits until the bot has created the tables we write to.
+        """
+        while True:
+            try:
+                async with self.conn.connection() as db:
+                    await db.execute("SELECT FROM tweet_watermarks LIMIT 0")
+                return
+            except psycopg.errors.UndefinedTable:
+                logging.info("Waiting for Silva to set up the database.")
+                await asyncio.sleep(retry)
+
+    async def run(self, passes: Optional[int] = None):
+        """
+        Scrapes forever, or for a number of passes.
+        """
+        await self.wait_for_schema()
+        await self.load_watermarks()
+        await self.load_seen()
+        logging.info(f"Now scraping {', '.join(self.usernames)}.")
+        done = 0
+        while passes is None or done < passes:
+            try:
+                count = await self.run_once()
+                logging.debug(f"Scraped {count} tweets.")
+            except psycopg.Error as e:
+                logging.warning(f"Could not write tweets: {e}")
+            done += 1
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        await self.conn.close()
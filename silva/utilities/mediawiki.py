@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# mediawiki.py
+# Helpers shared by the gbf.wiki and Wikimedia Commons API clients.
+
+import asyncio
+from typing import Any, AsyncIterator, Dict
+from silva.utilities.http_client import HttpClient
+
+
+async def iter_query(
+    client: HttpClient,
+    url: str,
+    params: Dict[str, Any],
+    list_name: str,
+    headers: Dict[str, str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs a MediaWiki action=query list request, follows its continuation
+    tokens and yields the list's entries as each page of results arrives.
+    The next page is fetched in the background once half of the current
+    one has been consumed, so a caller that stops early never pays for a
+    page it didn't reach.
+    :param params (dict): the query parameters, including list=list_name.
+    :param list_name (str): the list to read, ie "categorymembers".
+    """
+
+    async def fetch_page(continuation: dict) -> dict:
+        res = await client.get_json(
+            url, params={**params, **continuation}, headers=headers
+        )
+        if "error" in res.keys():
+            raise KeyError(f"{res['error'].get('info', res['error'])}")
+        return res
+
+    pending = asyncio.ensure_future(fetch_page({}))
+    try:
+        while pending:
+            res = await pending
+            pending = None
+            entries = res["query"][list_name]
+            continuation = res.get("continue")
+            for i, entry in enumerate(entries):
+                yield entry
+                if continuation and not pending and (i + 1) * 2 >= len(entries):
+                    pending = asyncio.ensure_future(fetch_page(continuation))
+            if continuation and not pending:
+                pending = asyncio.ensure_future(fetch_page(continuation))
+    finally:
+        if pending:
+            pending.cancel()
+            if pending.done() and not pending.cancelled():
+                # Retrieve the exception so it isn't logged as unhandled.
+                pending.exception()
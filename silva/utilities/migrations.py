@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# migrations.py
+# The versioned schema of the twitter Postgres database. Migrations are
+# applied in order, once each, when the bot starts.
+
+import logging
+from psycopg_pool import AsyncConnectionPool
+from typing import List, Tuple
+
+# Any constant works, as long as nothing else takes the same advisory lock.
+MIGRATION_LOCK = 7146330
+
+# (version, description, statements). Never edit a migration that has been
+# released; add a new one instead.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (
+        1,
+        "base schema (previously created by scraper.sh)",
+        [
+            "CREATE TABLE IF NOT EXISTS tweets (username TEXT,"
+            " status_id BIGINT, date TIMESTAMP WITH TIME ZONE,"
+            " silva_read BOOLEAN,"
+            " CONSTRAINT username_status_id UNIQUE (username, status_id))",
+            "ALTER TABLE tweets ADD COLUMN IF NOT EXISTS hashtags text ARRAY NULL",
+            "CREATE TABLE IF NOT EXISTS muted_hashtags"
+            " (id SERIAL PRIMARY KEY, hashtag TEXT)",
+            "CREATE TABLE IF NOT EXISTS muted_users (username text UNIQUE)",
+            "CREATE TABLE IF NOT EXISTS settings"
+            " (id SERIAL PRIMARY KEY, name TEXT, value TEXT)",
+        ],
+    ),
+    (
+        2,
+        "notify the bot of new tweets and muted user changes",
+        [
+            """
+            CREATE OR REPLACE FUNCTION notify_new_tweet() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('new_tweets', NEW.username);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS tweets_notify ON tweets",
+            "CREATE TRIGGER tweets_notify AFTER INSERT ON tweets"
+            " FOR EACH ROW EXECUTE FUNCTION notify_new_tweet()",
+            """
+            CREATE OR REPLACE FUNCTION notify_muted_users() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('muted_users', '');
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS muted_users_notify ON muted_users",
+            "CREATE TRIGGER muted_users_notify"
+            " AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON muted_users"
+            " FOR EACH STATEMENT EXECUTE FUNCTION notify_muted_users()",
+        ],
+    ),
+    (
+        3,
+        "partial index for unread tweet lookups",
+        [
+            "UPDATE tweets SET silva_read = false WHERE silva_read IS NULL",
+            "ALTER TABLE tweets ALTER COLUMN silva_read SET DEFAULT false",
+            "ALTER TABLE tweets ALTER COLUMN silva_read SET NOT NULL",
+            # The predicate matches the unread queries word for word, so the
+            # planner can always use it. It only holds unread tweets, so it
+            # stays tiny however much history is kept.
+            "CREATE INDEX IF NOT EXISTS idx_tweets_unread"
+            " ON tweets (username, date) WHERE silva_read is false",
+        ],
+    ),
+    (
+        4,
+        "partition tweets by month and add the tweets archive",
+        [
+            "ALTER TABLE tweets RENAME TO tweets_unpartitioned",
+            # Constraint and index names are shared across the schema.
+            "ALTER TABLE tweets_unpartitioned RENAME CONSTRAINT username_status_id"
+            " TO tweets_unpartitioned_username_status_id",
+            "DROP INDEX IF EXISTS idx_tweets_unread",
+            "DROP TRIGGER IF EXISTS tweets_notify ON tweets_unpartitioned",
+            # A unique constraint on a partitioned table has to include the
+            # partition key.
+            "CREATE TABLE tweets (username TEXT NOT NULL,"
+            " status_id BIGINT NOT NULL, date TIMESTAMP WITH TIME ZONE NOT NULL,"
+            " silva_read BOOLEAN NOT NULL DEFAULT false, hashtags text ARRAY NULL,"
+            " CONSTRAINT username_status_id UNIQUE (username, status_id, date))"
+            " PARTITION BY RANGE (date)",
+            # Catches anything outside the monthly partitions, like an old
+            # pinned tweet.
+            "CREATE TABLE tweets_default PARTITION OF tweets DEFAULT",
+            """
+            CREATE OR REPLACE FUNCTION create_tweet_partition(for_month date)
+            RETURNS void AS $$
+            DECLARE
+                month_start timestamp := date_trunc('month', for_month::timestamp);
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF tweets'
+                    ' FOR VALUES FROM (%L) TO (%L)',
+                    'tweets_' || to_char(month_start, 'YYYY_MM'),
+                    month_start AT TIME ZONE 'UTC',
+                    (month_start + interval '1 month') AT TIME ZONE 'UTC'
+                );
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            """
+            DO $$
+            DECLARE
+                month_start timestamp;
+            BEGIN
+                SELECT date_trunc('month', coalesce(min(date), now()) AT TIME ZONE 'UTC')
+                INTO month_start FROM tweets_unpartitioned;
+                WHILE month_start <= (now() AT TIME ZONE 'UTC') + interval '1 month' LOOP
+                    PERFORM create_tweet_partition(month_start::date);
+                    month_start := month_start + interval '1 month';
+                END LOOP;
+            END;
+            $$
+            """,
+            "INSERT INTO tweets (username, status_id, date, silva_read, hashtags)"
+            " SELECT username, status_id, date, coalesce(silva_read, false), hashtags"
+            " FROM tweets_unpartitioned"
+            " WHERE username IS NOT NULL AND status_id IS NOT NULL"
+            " AND date IS NOT NULL"
+            " ON CONFLICT DO NOTHING",
+            "DROP TABLE tweets_unpartitioned",
+            "CREATE INDEX idx_tweets_unread"
+            " ON tweets (username, date) WHERE silva_read is false",
+            "CREATE TRIGGER tweets_notify AFTER INSERT ON tweets"
+            " FOR EACH ROW EXECUTE FUNCTION notify_new_tweet()",
+            # What's left of tweets once their partition is past retention.
+            "CREATE TABLE IF NOT EXISTS tweets_archive (month date,"
+            " username TEXT, tweets int NOT NULL, PRIMARY KEY (month, username))",
+        ],
+    ),
+    (
+        5,
+        "per-account scraping watermarks",
+        [
+            "CREATE TABLE IF NOT EXISTS tweet_watermarks"
+            " (username TEXT PRIMARY KEY, status_id BIGINT NOT NULL)",
+        ],
+    ),
+    (
+        6,
+        "move default partition rows into newly created tweets partitions",
+        [
+            # A partition can't be created while the default partition holds
+            # rows in its range (after a long outage, or a future-dated
+            # tweet), so those are moved over with the default detached.
+            """
+            CREATE OR REPLACE FUNCTION create_tweet_partition(for_month date)
+            RETURNS void AS $$
+            DECLARE
+                month_start timestamp := date_trunc('month', for_month::timestamp);
+                partition_name text := 'tweets_' || to_char(month_start, 'YYYY_MM');
+                lo timestamptz := month_start AT TIME ZONE 'UTC';
+                hi timestamptz := (month_start + interval '1 month') AT TIME ZONE 'UTC';
+                stranded boolean;
+            BEGIN
+                IF to_regclass(partition_name) IS NOT NULL THEN
+                    RETURN;
+                END IF;
+                SELECT EXISTS (
+                    SELECT FROM tweets_default WHERE date >= lo AND date < hi
+                ) INTO stranded;
+                IF stranded THEN
+                    ALTER TABLE tweets DETACH PARTITION tweets_default;
+                END IF;
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF tweets'
+                    ' FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, lo, hi
+                );
+                IF stranded THEN
+                    EXECUTE format(
+                        'WITH moved AS (DELETE FROM tweets_default'
+                        ' WHERE date >= %L AND date < %L'
+                        ' RETURNING username, status_id, date, silva_read, hashtags)'
+                        ' INSERT INTO %I (username, status_id, date, silva_read, hashtags)'
+                        ' SELECT * FROM moved',
+                        lo, hi, partition_name
+                    );
+                    ALTER TABLE tweets ATTACH PARTITION tweets_default DEFAULT;
+                END IF;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+        ],
+    ),
+]
+
+
+async def migrate(pool: AsyncConnectionPool) -> int:
+    """
+    Applies every migration that hasn't been applied yet, in one
+    transaction. An advisory lock keeps two bots starting at once from
+    racing each other. Returns the number of migrations applied.
+    """
+    async with pool.connection() as db:
+        async with db.transaction():
+            await db.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK,))
+            await db.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations"
+                " (version int PRIMARY KEY, description text,"
+                " applied_at TIMESTAMP WITH TIME ZONE DEFAULT now())"
+            )
+            cur = await db.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in await cur.fetchall()}
+            count = 0
+            for version, description, statements in MIGRATIONS:
+                if version in applied:
+                    continue
+                logging.info(f"Applying migration {version}: {description}.")
+                for statement in statements:
+                    await db.execute(statement)
+                await db.execute(
+                    "INSERT INTO schema_migrations (version, description)"
+                    " VALUES (%s, %s)",
+                    (version, description),
+                )
+                count += 1
+    return count
@@ -2,12 +2,14 @@
 # misc.py
 from ast import Index
 import aiosqlite
+import logging
+import psycopg
+from psycopg import sql
 from psycopg.rows import dict_row
 from psycopg_pool import AsyncConnectionPool
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import re
 import random
-import aiohttp
 import io
 import cairosvg
 from datetime import datetime, date
@@ -18,16 +20,74 @@ import cv2
 from cv2 import dnn_superres
 import numpy
 from PIL import Image, ImageEnhance
+from silva.utilities import migrations
+from silva.utilities.http_client import HttpClient
 
 # EDSR from: https://github.com/Saafke/EDSR_Tensorflow/blob/master/models/EDSR_x4.pb
 MODEL = "./EDSR_x4.pb"
 
 class TwitterDatabase:
+    # The scraper NOTIFYs this channel whenever a tweet is inserted.
+    NEW_TWEETS_CHANNEL = "new_tweets"
+    # And this one whenever muted_users changes.
+    MUTED_USERS_CHANNEL = "muted_users"
+
     @classmethod
     async def create(cls, conn: str):
         self = TwitterDatabase()
+        self.conninfo = conn
         self.conn = AsyncConnectionPool(conn)
+        applied = await migrations.migrate(self.conn)
+        if applied:
+            logging.info(f"Applied {applied} twitter database migrations.")
+        self.muted_users = set()
+        await self.load_muted_users()
+        self.new_tweets = asyncio.Event()
+        # Check once straight away for anything that came in while we were down.
+        self.new_tweets.set()
+        self.listener = asyncio.get_event_loop().create_task(self.listen())
         return self
+
+    async def listen(self, retry: int = 30):
+        """
+        LISTENs for new tweet and muted user notifications on a dedicated
+        connection (a pooled one would be handed back to the pool): sets
+        new_tweets, or reloads the muted users. Reconnects if the connection
+        drops.
+        :param retry (int): seconds to wait before reconnecting.
+        """
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self.conninfo, autocommit=True
+                ) as db:
+                    await db.execute(f"LISTEN {self.NEW_TWEETS_CHANNEL}")
+                    await db.execute(f"LISTEN {self.MUTED_USERS_CHANNEL}")
+                    # Anything changed while we weren't listening was missed.
+                    await self.load_muted_users()
+                    self.new_tweets.set()
+                    async for notify in db.notifies():
+                        if notify.channel == self.MUTED_USERS_CHANNEL:
+                            await self.load_muted_users()
+                        else:
+                            self.new_tweets.set()
+            except psycopg.OperationalError as e:
+                logging.warning(f"Lost the new tweets listener: {e}")
+                await asyncio.sleep(retry)
+
+    async def wait_for_tweets(self, timeout: float):
+        """
+        Waits until new tweets are announced, or until the timeout passes.
+        """
+        try:
+            await asyncio.wait_for(self.new_tweets.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.new_tweets.clear()
+
+    async def close(self):
+        self.listener.cancel()
+        await self.conn.close()
     
     async def get_unread_tweets(self, username: str) -> List[Dict[str, str]]:
         cmd: str = """
@@ -51,6 +111,33 @@ class TwitterDatabase:
                     )
         return tweets
     
+    async def get_unread_tweets_for(
+        self, usernames: List[str]
+    ) -> List[Dict[str, str]]:
+        """
+        Gets the unread tweets of every given username in one query, oldest
+        first.
+        """
+        cmd: str = """
+        SELECT username, status_id, date FROM tweets
+        WHERE silva_read is false
+        AND username = ANY(%s)
+        ORDER BY date ASC;
+        """
+        async with self.conn.connection() as db:
+            async with db.cursor(row_factory=dict_row) as cur:
+                await cur.execute(cmd, (list(usernames),), prepare=True)
+                tweets: list = []
+                async for row in cur:
+                    tweets.append(
+                        {
+                            "username": row["username"],
+                            "tweet_date": row["date"],
+                            "tweet_id": row["status_id"],
+                        }
+                    )
+        return tweets
+
     async def mark_tweet_read(self, username: str, tweet_id: int):
         cmd: str = """
         UPDATE tweets
@@ -63,23 +150,162 @@ class TwitterDatabase:
                 await cur.execute(cmd, (username, tweet_id,), prepare=True)
         return
     
-    async def check_muted_user(self, username: str):
+    async def mark_tweets_read(self, tweets: List[Tuple[str, int]]):
+        """
+        Marks a batch of (username, status_id) pairs read in one statement.
+        """
+        cmd: str = """
+        UPDATE tweets
+        SET silva_read = true
+        FROM unnest(%s::text[], %s::bigint[]) AS read(username, status_id)
+        WHERE tweets.username = read.username
+        AND tweets.status_id = read.status_id
+        """
+        if not tweets:
+            return
+        usernames, tweet_ids = zip(*tweets)
+        async with self.conn.connection() as db:
+            async with db.cursor() as cur:
+                await cur.execute(
+                    cmd, (list(usernames), list(tweet_ids)), prepare=True
+                )
+        return
+
+    async def create_tweet_partitions(self, months_ahead: int = 3):
         """
-        Check if a username is ignored.
+        Makes sure the monthly tweets partitions exist from this month to
+        months_ahead months from now. Each month is created in its own
+        transaction, so one failing doesn't hold up the rest.
+        """
+        cmd: str = """
+        SELECT create_tweet_partition(
+            (now() AT TIME ZONE 'UTC' + make_interval(months => %s))::date
+        )
+        """
+        async with await psycopg.AsyncConnection.connect(
+            self.conninfo, autocommit=True
+        ) as db:
+            for months in range(months_ahead + 1):
+                try:
+                    await db.execute(cmd, (months,))
+                except psycopg.Error as e:
+                    logging.warning(
+                        f"Could not create the tweets partition {months} months"
+                        f" from now: {e}"
+                    )
+        return
+
+    def months_ago(self, months: int) -> date:
+        """
+        The first day of the month, UTC, a number of months ago.
+        """
+        now = datetime.utcnow()
+        month = now.year * 12 + now.month - 1 - months
+        return date(month // 12, month % 12 + 1, 1)
+
+    async def enforce_tweet_retention(
+        self, months: int, unread_months: int = None
+    ) -> int:
+        """
+        Summarizes tweets older than the retention period into
+        tweets_archive (a per-month, per-account count) and drops them.
+        Partitions still holding unread tweets are kept until they're
+        older than unread_months (by default twice the retention period),
+        so a few never-posted tweets can't pin them forever.
+        Returns the number of partitions dropped.
+        """
+        if unread_months is None:
+            unread_months = months * 2
+        cutoff = self.months_ago(months)
+        unread_cutoff = self.months_ago(unread_months)
+        # Detached leftovers of an interrupted run show up here too.
+        cmd: str = """
+        SELECT relname, relispartition FROM pg_class
+        WHERE relname ~ '^tweets_[0-9]{4}_[0-9]{2}$'
+        AND relkind = 'r' AND pg_table_is_visible(oid)
+        """
+        summarize: str = """
+        INSERT INTO tweets_archive (month, username, tweets)
+        SELECT date_trunc('month', date AT TIME ZONE 'UTC')::date, username, count(*)
+        FROM {}
+        WHERE date < %s AND (silva_read is true OR date < %s)
+        GROUP BY 1, 2
+        ON CONFLICT (month, username)
+        DO UPDATE SET tweets = tweets_archive.tweets + excluded.tweets
+        """
+        dropped = 0
+        # Autocommit, so every transaction below is a real one: locks on
+        # tweets are only held for as long as a single detach.
+        async with await psycopg.AsyncConnection.connect(
+            self.conninfo, autocommit=True
+        ) as db:
+            cur = await db.execute(cmd)
+            partitions = await cur.fetchall()
+            for partition, attached in sorted(partitions):
+                year, month = partition.split("_")[1:]
+                partition_month = date(int(year), int(month), 1)
+                if partition_month >= cutoff:
+                    continue
+                table = sql.Identifier(partition)
+                if attached:
+                    async with db.transaction():
+                        cur = await db.execute(
+                            sql.SQL(
+                                "SELECT EXISTS"
+                                " (SELECT FROM {} WHERE silva_read is false)"
+                            ).format(table)
+                        )
+                        unread = (await cur.fetchone())[0]
+                        if unread and partition_month >= unread_cutoff:
+                            logging.warning(
+                                f"{partition} has unread tweets; keeping it."
+                            )
+                            continue
+                        await db.execute(
+                            sql.SQL("ALTER TABLE tweets DETACH PARTITION {}").format(
+                                table
+                            )
+                        )
+                # Detached, so summarizing and dropping it blocks nobody.
+                async with db.transaction():
+                    await db.execute(
+                        sql.SQL(summarize).format(table), (cutoff, cutoff)
+                    )
+                    await db.execute(sql.SQL("DROP TABLE {}").format(table))
+                dropped += 1
+            # Tweets that fell outside the monthly partitions.
+            async with db.transaction():
+                await db.execute(
+                    sql.SQL(summarize).format(sql.Identifier("tweets_default")),
+                    (cutoff, unread_cutoff),
+                )
+                await db.execute(
+                    "DELETE FROM tweets_default WHERE date < %s"
+                    " AND (silva_read is true OR date < %s)",
+                    (cutoff, unread_cutoff),
+                )
+        return dropped
+
+    async def load_muted_users(self):
+        """
+        (Re)loads the muted usernames from the database.
         """
         cmd: str = """
         SELECT username FROM muted_users
-        WHERE username = %s
         """
         async with self.conn.connection() as db:
             async with db.cursor() as cur:
-                await cur.execute(cmd, (username,), prepare=True)
-                res = await cur.fetchone()
-        
-        if res:
-            return True
-        return False
-    
+                await cur.execute(cmd)
+                self.muted_users = {row[0] async for row in cur}
+        return
+
+    def check_muted_user(self, username: str) -> bool:
+        """
+        Check if a username is ignored. Answered from memory; the muted
+        users are kept in sync by mute/unmute and by notifications.
+        """
+        return username in self.muted_users
+
     async def mute_twitter_user(self, username: str):
         """
         Mutes a twitter username.
@@ -87,11 +313,12 @@ class TwitterDatabase:
         cmd: str = """
         INSERT INTO muted_users (username)
         VALUES (%s)
-        ON CONFLICT username DO NOTHING;
+        ON CONFLICT (username) DO NOTHING;
         """
         async with self.conn.connection() as db:
             async with db.cursor() as cur:
                 await cur.execute(cmd, (username,))
+        self.muted_users.add(username)
         return
 
     async def unmute_twitter_user(self, username: str):
@@ -105,6 +332,7 @@ class TwitterDatabase:
         async with self.conn.connection() as db:
             async with db.cursor() as cur:
                 await cur.execute(cmd, (username,))
+        self.muted_users.discard(username)
         return
 
 
@@ -271,6 +499,36 @@ class Database:
             await db.execute(cmd, (role,))
             await db.commit()
 
+    async def get_event_messages(self, channel_id: int) -> List[int]:
+        """
+        Gets the IDs of the current and upcoming events messages the bot
+        keeps in a channel, or None if none are registered.
+        """
+        cmd: str = """
+        SELECT current_message_id, upcoming_message_id FROM event_messages
+        WHERE channel_id = ? LIMIT 1;
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(cmd, (channel_id,)) as cursor:
+                row = await cursor.fetchone()
+        if not row:
+            return None
+        return [row["current_message_id"], row["upcoming_message_id"]]
+
+    async def set_event_messages(
+        self, channel_id: int, current_message_id: int, upcoming_message_id: int
+    ) -> None:
+        cmd: str = """
+        INSERT OR REPLACE INTO event_messages
+        (channel_id, current_message_id, upcoming_message_id) VALUES (?, ?, ?)
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            await db.execute(
+                cmd, (channel_id, current_message_id, upcoming_message_id,)
+            )
+            await db.commit()
+
     class MissingUserError(Exception):
         pass
 
@@ -478,6 +736,9 @@ class TextUtils:
 
 
 class EmojiUtils:
+    def __init__(self, client: HttpClient):
+        self.client = client
+
     async def get_emoji(self, cdn: str, emoji_id: str, gpt: bool=False, width_limit: bool=True, gpt_use_close: bool=True):
         """
         Downloads the requested emoji from a given CDN.
@@ -500,48 +761,46 @@ class EmojiUtils:
         if cdn == "discord":
             emoji_url = "https://cdn.discordapp.com/emojis/"
         try:
-            async with aiohttp.ClientSession() as session:
-                if cdn == "discord":
-                    resp = await session.get(f"{emoji_url}/{emoji_id}.gif", timeout=10)
-                    img_type = "gif"
-                    if resp.status != 200:
-                        resp = await session.get(
-                            f"{emoji_url}/{emoji_id}.png", timeout=10
-                        )
-                        img_type = "png"
-                    output = io.BytesIO(await resp.read())
-                    # Check the resolution of the output, and if width < 100,
-                    # increase image resolution and enhance for sharpness.
-                    # It won't be perfect and it won't work well for all
-                    # images, but ¯\_(ツ)_/¯
-                    image = Image.open(output)
-                    if image.width < 100 and img_type == "png":
-                        if gpt:
-                                if gpt_use_close:
-                                    output = await self.gpt_enhance_image(output, img_type)
-                                else:
-                                    output = await self.gpt_enhance_image_simple(output, img_type)
-                        else:
-                            output = await self.enhance_image(output, img_type)
-                    else:
-                        output.seek(0)
-                    return (output, img_type)
-                if cdn == "maxcdn":
-                    resp = await session.get(f"{emoji_url}/{emoji_id}.svg", timeout=10)
+            client = self.client
+            if cdn == "discord":
+                resp = await client.get(f"{emoji_url}/{emoji_id}.gif")
+                img_type = "gif"
+                if resp.status != 200:
+                    resp = await client.get(f"{emoji_url}/{emoji_id}.png")
                     img_type = "png"
-                    if resp.status != 200:
-                        raise NoEmojiFound("No emoji found.")
-                    data = await resp.read()
-                    input = io.BytesIO(data)
-                    output = io.BytesIO()
-                    input.seek(0)
-                    cairosvg.svg2png(
-                        file_obj=input,
-                        parent_height=128,
-                        parent_width=128,
-                        write_to=output,
-                    )
+                output = io.BytesIO(resp.body)
+                # Check the resolution of the output, and if width < 100,
+                # increase image resolution and enhance for sharpness.
+                # It won't be perfect and it won't work well for all
+                # images, but ¯\_(ツ)_/¯
+                image = Image.open(output)
+                if image.width < 100 and img_type == "png":
+                    if gpt:
+                            if gpt_use_close:
+                                output = await self.gpt_enhance_image(output, img_type)
+                            else:
+                                output = await self.gpt_enhance_image_simple(output, img_type)
+                    else:
+                        output = await self.enhance_image(output, img_type)
+                else:
+                    output.seek(0)
                 return (output, img_type)
+            if cdn == "maxcdn":
+                resp = await client.get(f"{emoji_url}/{emoji_id}.svg")
+                img_type = "png"
+                if resp.status != 200:
+                    raise NoEmojiFound("No emoji found.")
+                data = resp.body
+                input = io.BytesIO(data)
+                output = io.BytesIO()
+                input.seek(0)
+                cairosvg.svg2png(
+                    file_obj=input,
+                    parent_height=128,
+                    parent_width=128,
+                    write_to=output,
+                )
+            return (output, img_type)
         except NoEmojiFound as e:
             raise NoEmojiFound(e)
         except Exception as e:
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# page_cache.py
+# A disk-backed cache of parsed gbf.wiki pages, keyed by page ID and
+# revalidated against the page's latest revision ID.
+
+import aiosqlite
+from typing import Dict, Optional
+
+
+class PageCache:
+    def __init__(self, conn: str):
+        self.conn = conn
+
+    async def get_page(self, pageid: int) -> Optional[Dict[str, str]]:
+        """
+        Returns the cached revid, title and text for a page, or None if the
+        page has never been cached.
+        """
+        cmd: str = """
+        SELECT pageid, revid, title, text FROM pages
+        WHERE pageid = ? LIMIT 1;
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(cmd, (pageid,)) as cursor:
+                row = await cursor.fetchone()
+        if not row:
+            return None
+        return dict(row)
+
+    async def set_page(self, pageid: int, revid: int, title: str, text: str):
+        """
+        Stores (or replaces) the parsed text of a page at a given revision.
+        """
+        cmd: str = """
+        INSERT OR REPLACE INTO pages(pageid, revid, title, text)
+        VALUES (?, ?, ?, ?)
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            await db.execute(cmd, (pageid, revid, title, text))
+            await db.commit()
@@ -2,64 +2,134 @@
 # scheduled_commands.py
 
 from silva.utilities import gbfwiki
-from discord import Embed, Colour
-from datetime import datetime
+from silva.utilities.timeline import Timeline
 import asyncio
-import pytz
+import heapq
 import logging
+import time
 
 
 class ScheduledEvents:
     def __init__(self, bot):
         self.bot = bot
 
-    async def update_events(self, interval: int = 1):
+    def get_boundaries(self, timeline: Timeline, now: float) -> list:
         """
-        Updates the events channel.
-        :interval (int): The interval in hours to update.
+        Builds a min-heap of the upcoming event start and end times.
+        """
+        boundaries = timeline.boundaries_after(now)
+        heapq.heapify(boundaries)
+        return boundaries
+
+    def next_wakeup(self, boundaries: list, now: float, deadline: float) -> float:
+        """
+        Pops the boundaries that have passed and returns the seconds until
+        the next one, or until the deadline if that comes first.
+        """
+        while boundaries and boundaries[0] <= now:
+            heapq.heappop(boundaries)
+        wakeup = deadline
+        if boundaries:
+            # Wake just after the boundary so the event has flipped.
+            wakeup = min(wakeup, boundaries[0] + 1)
+        return max(wakeup - now, 0)
+
+    async def update_events(self, interval: int = 1, retry: int = 60):
+        """
+        Updates the events channel whenever an event starts or ends, and
+        refetches from the wiki at least every interval.
+        :interval (int): The maximum interval in hours between updates.
+        :retry (int): Seconds before retrying a failed fetch; doubles on each
+            failure in a row, up to the interval.
         """
         bot = self.bot
         await bot.wait_until_ready()
         channel = bot.get_channel(bot.events_channel)
         logging.info(f"update_events being ran on {channel}.")
+        seconds = interval * 3600
+        boundaries: list = []
+        wiki = None
+        deadline = 0.0
+        failures = 0
+        while bot.is_ready():
+            now = time.time()
+            try:
+                if wiki is None or now >= deadline:
+                    logging.info("sending an event update.")
+                    wiki = await bot.event_cache.refresh()
+                    deadline = now + seconds
+                    boundaries = self.get_boundaries(wiki.get_timeline(), now)
+                else:
+                    # An event boundary: the data from the last refresh
+                    # already says what changed, so there's no need to go
+                    # back to the wiki.
+                    logging.info("sending an event update for an event boundary.")
+                await bot.event_publisher.publish(channel, wiki.get_timeline())
+                failures = 0
+            except Exception as e:
+                logging.warning(f"Could not update events: {e}")
+                deadline = now + min(retry * 2 ** failures, seconds)
+                failures += 1
+            now = time.time()
+            await asyncio.sleep(self.next_wakeup(boundaries, now, deadline))
+
+    async def update_summon_index(self, interval: int = 24):
+        """
+        Crawls gbf.wiki for summons that aren't in the local summon index yet.
+        :interval (int): The interval in hours between crawls.
+        """
+        bot = self.bot
+        await bot.wait_until_ready()
+        while bot.is_ready():
+            wiki = gbfwiki.Wiki(bot.http_client.as_background(), bot.page_cache)
+            try:
+                summons = await wiki.get_summons_page()
+                bot.summon_resolver.refresh(summons)
+                count = await bot.summon_index.refresh(wiki, summons)
+                logging.info(f"summon index refreshed; {count} summons indexed.")
+            except Exception as e:
+                logging.warning(f"Could not refresh the summon index: {e}")
+            await asyncio.sleep(interval * 3600)
+
+    async def update_event_archive(self, interval: int = 24):
+        """
+        Pulls new event_history rows from gbf.wiki into the local archive.
+        :interval (int): The interval in hours between syncs.
+        """
+        bot = self.bot
+        await bot.wait_until_ready()
+        while bot.is_ready():
+            wiki = gbfwiki.Wiki(bot.http_client.as_background())
+            try:
+                count = await bot.event_archive.sync(wiki)
+                logging.info(f"event archive synced; {count} rows written.")
+            except Exception as e:
+                logging.warning(f"Could not sync the event archive: {e}")
+            await asyncio.sleep(interval * 3600)
+
+    async def fill_weapon_pool(self):
+        """
+        Keeps a few random weapon descriptions ready to go.
+        """
+        bot = self.bot
+        await bot.wait_until_ready()
+        await bot.weapon_pool.run()
+
+    async def update_weapon_search(self, interval: int = 24):
+        """
+        Indexes the flavor text of new and edited weapons for weaponsearch.
+        :interval (int): The interval in hours between refreshes.
+        """
+        bot = self.bot
+        await bot.wait_until_ready()
         while bot.is_ready():
-            logging.info("sending an event update.")
-            seconds = interval * 3600
-            now = datetime.utcnow().replace(tzinfo=pytz.utc)
-            wiki = await gbfwiki.init_wiki()
-            events = wiki.get_events()
-            msg_current = Embed(
-                title="Granblue Fantasy Current Events",
-                url="https://gbf.wiki",
-                color=Colour.teal(),
-                timestamp=now,
-            )
-            for event in events["current"]:
-                msg_current.add_field(
-                    name=f"[{event['title']}]({event['url']})",
-                    value=f"Ends on {event['finish']}",
-                    inline=False,
-                )
-            msg_upcoming = Embed(
-                title="Granblue Fantasy Upcoming Events",
-                url="https://gbf.wiki",
-                color=Colour.dark_purple(),
-                timestamp=now,
-            )
-            for event in events["upcoming"]:
-                msg_upcoming.add_field(
-                    name=f"[{event['title']}]({event['url']})",
-                    value=f"{event['start']} to {event['finish']}",
-                    inline=False,
-                )
-            existing_messages = []
-            async for message in channel.history(limit=200):
-                # Assume the first message to edit is the current events,
-                # and the second message is the upcoming events.
-                if message.author == bot.user and message.pinned:
-                    existing_messages.append(message)
-                if len(existing_messages) >= 2:
-                    break
-            await existing_messages[0].edit(embed=msg_current)
-            await existing_messages[1].edit(embed=msg_upcoming)
-            await asyncio.sleep(seconds)
+            # No page cache: this reads every weapon page once, and the
+            # extracted text is all that's worth keeping.
+            wiki = gbfwiki.Wiki(bot.http_client.as_background())
+            try:
+                await bot.weapon_pool.load_index()
+                count = await bot.weapon_search.refresh(wiki, bot.weapon_pool.index)
+                logging.info(f"weapon search refreshed; {count} weapons indexed.")
+            except Exception as e:
+                logging.warning(f"Could not refresh the weapon search: {e}")
+            await asyncio.sleep(interval * 3600)
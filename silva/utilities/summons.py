@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# summons.py
+# A local index of summon call names, built by crawling gbf.wiki once so
+# combo name lookups don't have to download and parse summon pages.
+
+import aiosqlite
+import bisect
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+from silva.utilities import html_parsing
+from silva.utilities.gbfwiki import Wiki
+
+
+class SummonIndex:
+    def __init__(self, conn: str):
+        self.conn = conn
+
+    async def get_summons(self, *pageids: int) -> Dict[int, Dict[str, str]]:
+        """
+        Gets the indexed summons for the given page IDs, keyed by page ID.
+        Page IDs that haven't been indexed are left out.
+        """
+        placeholders = ", ".join("?" for _ in pageids)
+        cmd: str = f"""
+        SELECT pageid, revid, name, call, first_half, second_half FROM summons
+        WHERE pageid IN ({placeholders});
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(cmd, pageids) as cursor:
+                rows = await cursor.fetchall()
+        return {row["pageid"]: dict(row) for row in rows}
+
+    async def get_revisions(self) -> Dict[int, int]:
+        """
+        Gets the revision each indexed summon was indexed at.
+        """
+        cmd: str = """
+        SELECT pageid, revid FROM summons;
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            async with db.execute(cmd) as cursor:
+                rows = await cursor.fetchall()
+        return {pageid: revid for pageid, revid in rows}
+
+    async def set_summon(self, pageid: int, revid: int, info: Dict[str, str]):
+        cmd: str = """
+        INSERT OR REPLACE INTO summons
+        (pageid, revid, name, call, first_half, second_half)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            await db.execute(
+                cmd,
+                (
+                    pageid,
+                    revid,
+                    info["name"],
+                    info["call"],
+                    info["first_half"],
+                    info["second_half"],
+                ),
+            )
+            await db.commit()
+
+    async def rm_summons(self, pageids: Set[int]):
+        cmd: str = """
+        DELETE FROM summons WHERE pageid = ?
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            await db.executemany(cmd, [(pageid,) for pageid in pageids])
+            await db.commit()
+
+    async def index_summon(
+        self, wiki: Wiki, pageid: int, revid: int = None
+    ) -> Dict[str, str]:
+        """
+        Parses a single summon page and stores it in the index.
+        """
+        if revid is None:
+            revid = await wiki.get_revision(pageid)
+        page = await wiki.get_page_soup(
+            pageid, revid=revid, parse_only=html_parsing.SUMMON_STRAINER
+        )
+        info = await wiki.get_summon_info(page)
+        await self.set_summon(pageid, revid, info)
+        return info
+
+    async def refresh(self, wiki: Wiki, summons: List[Dict[str, str]] = None) -> int:
+        """
+        Incrementally refreshes the index: summons that are new to the
+        category or edited since they were indexed get (re)indexed, and
+        summons that left it get dropped. Revisions are checked in batches.
+        summons: the output of wiki.get_summons_page(), if already fetched.
+        Returns the number of summons (re)indexed.
+        """
+        if summons is None:
+            summons = await wiki.get_summons_page()
+        indexed = await self.get_revisions()
+        current = {summon["pageid"] for summon in summons}
+        removed = set(indexed.keys()) - current
+        if removed:
+            await self.rm_summons(removed)
+        count = 0
+        async for page in wiki.iter_revisions(list(current)):
+            pageid = page["pageid"]
+            if indexed.get(pageid) == page["revid"]:
+                continue
+            try:
+                await self.index_summon(wiki, pageid, page["revid"])
+                count += 1
+            except Exception as e:
+                logging.warning(f"Could not index summon {pageid}: {e}")
+        return count
+
+    async def get_combo_name(self, wiki: Wiki, summon1: int, summon2: int) -> str:
+        """
+        Gets the combo call name of two summons from the index. Summons that
+        haven't been indexed yet are fetched and indexed on the spot.
+        See Wiki.get_combo_name for the rules.
+        """
+        summons = await self.get_summons(summon1, summon2)
+        for pageid in (summon1, summon2):
+            if pageid not in summons:
+                summons[pageid] = await self.index_summon(wiki, pageid)
+        s1 = summons[summon1]
+        s2 = summons[summon2]
+        return wiki.combine_halves(
+            s1["first_half"], s1["second_half"], s2["first_half"], s2["second_half"]
+        )
+
+
+class SummonResolver:
+    """
+    Resolves what users type into summon page IDs. Built from the
+    categorymembers list of the summons category, with a sorted prefix index
+    for partial names and a trigram index for typos.
+    """
+
+    def __init__(self, min_score: float = 0.25):
+        self.min_score = min_score
+        self.signature = frozenset()
+        self.titles: List[Tuple[int, str]] = []
+        self.prefixes: List[Tuple[str, int]] = []
+        self.trigrams: Dict[str, List[int]] = {}
+        self.trigram_counts: List[int] = []
+
+    def normalize(self, name: str) -> str:
+        return " ".join(re.sub(r"[^\w]+", " ", name.lower()).split())
+
+    def get_trigrams(self, name: str) -> Set[str]:
+        padded = f"  {name} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def refresh(self, summons: List[Dict[str, str]]) -> bool:
+        """
+        Rebuilds the index if the summon category has changed.
+        summons: the output of Wiki.get_summons_page().
+        Returns whether the index was rebuilt.
+        """
+        signature = frozenset((s["pageid"], s["title"]) for s in summons)
+        if signature == self.signature:
+            return False
+        titles: list = []
+        prefixes: list = []
+        trigrams = defaultdict(list)
+        trigram_counts: list = []
+        for idx, (pageid, title) in enumerate(sorted(signature)):
+            name = self.normalize(title)
+            titles.append((pageid, title))
+            # Index every word boundary so "bahamut" finds "Proto Bahamut".
+            words = name.split()
+            for i in range(len(words)):
+                prefixes.append((" ".join(words[i:]), idx))
+            grams = self.get_trigrams(name)
+            for gram in grams:
+                trigrams[gram].append(idx)
+            trigram_counts.append(len(grams))
+        prefixes.sort()
+        # Swap everything in at once so lookups never see a half-built index.
+        self.titles, self.prefixes = titles, prefixes
+        self.trigrams, self.trigram_counts = dict(trigrams), trigram_counts
+        self.signature = signature
+        return True
+
+    def resolve(self, name: str) -> Tuple[int, str]:
+        """
+        Resolves a summon name to its (pageid, title). Exact matches win,
+        then the shortest name starting with what was typed, then the
+        closest name by trigram similarity.
+        """
+        query = self.normalize(name)
+        if not query:
+            raise self.NoSummonFound(f'No summon found for "{name}".')
+        titles = self.titles
+        prefixes = self.prefixes
+        start = bisect.bisect_left(prefixes, (query, -1))
+        matches: list = []
+        for key, idx in prefixes[start:]:
+            if not key.startswith(query):
+                break
+            matches.append(idx)
+        if matches:
+            exact = [idx for idx in matches if self.normalize(titles[idx][1]) == query]
+            if exact:
+                return titles[exact[0]]
+            return titles[min(matches, key=lambda idx: len(titles[idx][1]))]
+        grams = self.get_trigrams(query)
+        shared = defaultdict(int)
+        for gram in grams:
+            for idx in self.trigrams.get(gram, ()):
+                shared[idx] += 1
+        best, best_score = None, 0.0
+        for idx, count in shared.items():
+            score = count / (len(grams) + self.trigram_counts[idx] - count)
+            if score > best_score:
+                best, best_score = idx, score
+        if best is None or best_score < self.min_score:
+            raise self.NoSummonFound(f'No summon found for "{name}".')
+        return titles[best]
+
+    class NoSummonFound(Exception):
+        pass
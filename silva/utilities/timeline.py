@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# timeline.py
+# A compact, queryable timeline of gbf.wiki events.
+
+import bisect
+import math
+from typing import Dict, List, Tuple
+
+
+class TimelineEvent:
+    __slots__ = ("title", "start", "finish", "utc_start", "utc_end", "url")
+
+    def __init__(
+        self,
+        title: str,
+        start: str,
+        finish: str,
+        utc_start: int,
+        utc_end: int,
+        url: str,
+    ):
+        self.title = title
+        self.start = start
+        self.finish = finish
+        self.utc_start = utc_start
+        self.utc_end = utc_end
+        self.url = url
+
+    def __repr__(self):
+        return f"TimelineEvent('{self.title}', {self.utc_start}, {self.utc_end})"
+
+    @property
+    def end(self) -> float:
+        """
+        When the event stops running. Events without a real end time
+        never stop.
+        """
+        if self.utc_end <= self.utc_start:
+            return math.inf
+        return self.utc_end
+
+    def as_dict(self) -> Dict[str, str]:
+        """
+        Returns the event in the dict format of Wiki.get_events().
+        """
+        return {
+            "title": self.title,
+            "start": self.start,
+            "finish": self.finish,
+            "utc start": self.utc_start,
+            "utc end": self.utc_end,
+            "url": self.url,
+        }
+
+
+class _Node:
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, center, by_start, by_end, left, right):
+        self.center = center
+        self.by_start = by_start
+        self.by_end = by_end
+        self.left = left
+        self.right = right
+
+
+class Timeline:
+    """
+    Holds events in a centered interval tree for "what is running at T",
+    plus start- and end-sorted arrays for window queries. All queries are
+    logarithmic in the number of events (plus the size of the answer).
+    An event runs from utc_start (inclusive) to its end (exclusive).
+    """
+
+    def __init__(self, events: List[TimelineEvent]):
+        self.events = sorted(events, key=lambda e: e.utc_start)
+        self.starts = [e.utc_start for e in self.events]
+        self.events_by_end = sorted(events, key=lambda e: e.end)
+        self.ends = [e.end for e in self.events_by_end]
+        self.root = self._build(self.events)
+
+    def __len__(self):
+        return len(self.events)
+
+    def _build(self, events: List[TimelineEvent]) -> _Node:
+        if not events:
+            return None
+        # Centering on an event's start guarantees that event stays in this
+        # node, so every level of the tree gets smaller.
+        center = events[len(events) // 2].utc_start
+        left, right, here = [], [], []
+        for event in events:
+            if event.end <= center:
+                left.append(event)
+            elif event.utc_start > center:
+                right.append(event)
+            else:
+                here.append(event)
+        by_start = sorted(here, key=lambda e: e.utc_start)
+        by_end = sorted(here, key=lambda e: e.end, reverse=True)
+        return _Node(center, by_start, by_end, self._build(left), self._build(right))
+
+    def running_at(self, timestamp: float) -> List[TimelineEvent]:
+        """
+        Events running at a timestamp, sorted by start.
+        """
+        found: list = []
+        node = self.root
+        while node:
+            if timestamp < node.center:
+                for event in node.by_start:
+                    if event.utc_start > timestamp:
+                        break
+                    found.append(event)
+                node = node.left
+            else:
+                for event in node.by_end:
+                    if event.end <= timestamp:
+                        break
+                    found.append(event)
+                node = node.right
+        return sorted(found, key=lambda e: e.utc_start)
+
+    def starting_between(self, start: float, end: float) -> List[TimelineEvent]:
+        """
+        Events starting in [start, end), sorted by start.
+        """
+        lo = bisect.bisect_left(self.starts, start)
+        hi = bisect.bisect_left(self.starts, end)
+        return self.events[lo:hi]
+
+    def ending_between(self, start: float, end: float) -> List[TimelineEvent]:
+        """
+        Events ending in [start, end), sorted by end.
+        """
+        lo = bisect.bisect_left(self.ends, start)
+        hi = bisect.bisect_left(self.ends, end)
+        return self.events_by_end[lo:hi]
+
+    def split(self, now: float) -> Tuple[List[TimelineEvent], List[TimelineEvent]]:
+        """
+        Splits the timeline into (current, upcoming) events at a timestamp.
+        """
+        upcoming = self.events[bisect.bisect_right(self.starts, now):]
+        return self.running_at(now), upcoming
+
+    def boundaries_after(self, now: float) -> List[int]:
+        """
+        Every start and end time after a timestamp, unsorted.
+        """
+        upcoming_starts = self.starts[bisect.bisect_right(self.starts, now):]
+        upcoming_ends = self.ends[bisect.bisect_right(self.ends, now):]
+        return upcoming_starts + [x for x in upcoming_ends if x != math.inf]
@@ -1,34 +1,42 @@
-import requests
+import aiosqlite
+import asyncio
+import logging
 import random
-from bs4 import BeautifulSoup
+import time
+from silva.utilities import html_parsing, mediawiki
+from silva.utilities.gbfwiki import Wiki
+from silva.utilities.http_client import HttpClient
 
 WIKI = "https://gbf.wiki/"
 API = WIKI + "api.php"
 USER_AGENT = "Granblue SA Silva Bot (Written by Hail Hydrate#9035)"
 
 # Returns a dictionary mapping Mediawiki page IDs to weapon names
-# TODO: only gets the first 500 right now, because of limitations
-# either figure out paging or get bot permission to go up to 5000
-def getIndex(session):
+# Follows continuation, so every page of Category:Weapons is included.
+async def getIndex(client: HttpClient):
     q = {
         "action": "query",
         "list": "categorymembers",
         "cmtitle": "Category:Weapons",
-        "cmlimit": 2500,
+        "cmlimit": "max",
         "format": "json",
+        "maxlag": 5,
     }
-    res = session.get(url=API, params=q, headers={"User-Agent": USER_AGENT})
-    items = res.json()["query"]["categorymembers"]
-    return {i["pageid"]: i["title"] for i in items}
+    items = mediawiki.iter_query(
+        client, API, q, "categorymembers", headers={"User-Agent": USER_AGENT}
+    )
+    return {i["pageid"]: i["title"] async for i in items}
 
 
 # Extracts the associated weapon's flavor text given a page ID
-def weaponDescriptionFromId(session, id):
-    q = {"curid": id}
-    res = session.get(url=WIKI, params=q, headers={"User-Agent": USER_AGENT})
-    soup = BeautifulSoup(res.text, "html.parser")
-    m = soup.find("div", attrs={"class": "weapon"}).find_all("table")
-    for table in m:
+# Goes through the wiki's page cache and only parses the weapon infobox.
+async def weaponDescriptionFromId(wiki: Wiki, id, revid=None):
+    text = await wiki.get_page_text(id, revid=revid)
+    soup = await html_parsing.parse(text, html_parsing.WEAPON_STRAINER)
+    weapon = soup.find("div", attrs={"class": "weapon"})
+    if not weapon:
+        return None
+    for table in weapon.find_all("table"):
         elements = table.find_all("tr")
         if "display:none;" in str(table) and len(elements) == 2:  # fuck it
             return elements[1].contents[1].string
@@ -37,6 +45,164 @@ def weaponDescriptionFromId(session, id):
 
 # Selects a random weapon from a getIndex() result and returns a
 # dictionary mapping the weapon's name with its flavor text
-def randomWeaponDescription(session, index):
+async def randomWeaponDescription(wiki: Wiki, index):
     id = random.choice(list(index.keys()))
-    return {index[id]: weaponDescriptionFromId(session, id)}
+    return {index[id]: await weaponDescriptionFromId(wiki, id)}
+
+
+# Keeps the weapon index cached locally and a queue of random weapon flavor
+# texts extracted ahead of time, so a random description is ready instantly.
+class WeaponPool:
+    def __init__(
+        self,
+        wiki: Wiki,
+        conn: str,
+        size: int = 20,
+        index_ttl: int = 24 * 3600,
+    ):
+        self.wiki = wiki
+        self.conn = conn
+        self.index_ttl = index_ttl
+        self.index = {}
+        # Wall-clock time the index was fetched from the wiki.
+        self.index_loaded = 0.0
+        # Page IDs to pick random weapons from.
+        self.candidates = []
+        self.descriptions = asyncio.Queue(maxsize=size)
+
+    async def load_index(self):
+        """
+        Loads the weapon index from the local cache, refreshing it from the
+        wiki when it's empty or was fetched more than index_ttl ago.
+        """
+        if not self.index:
+            async with aiosqlite.connect(self.conn) as db:
+                async with db.execute("SELECT pageid, title FROM weapons") as cursor:
+                    self.index = {pageid: title async for pageid, title in cursor}
+                async with db.execute(
+                    "SELECT fetched_at FROM cache_times WHERE name = 'weapons'"
+                ) as cursor:
+                    row = await cursor.fetchone()
+            self.index_loaded = row[0] if row else 0.0
+            self.candidates = list(self.index.keys())
+        if self.index and time.time() - self.index_loaded < self.index_ttl:
+            return
+        index = await getIndex(self.wiki.client)
+        now = time.time()
+        async with aiosqlite.connect(self.conn) as db:
+            await db.execute("DELETE FROM weapons")
+            await db.executemany(
+                "INSERT INTO weapons(pageid, title) VALUES (?, ?)", index.items()
+            )
+            await db.execute(
+                "INSERT OR REPLACE INTO cache_times(name, fetched_at)"
+                " VALUES ('weapons', ?)",
+                (now,),
+            )
+            await db.commit()
+        self.index = index
+        self.index_loaded = now
+        self.candidates = list(index.keys())
+        logging.info(f"weapon index refreshed; {len(index)} weapons.")
+
+    async def run(self):
+        """
+        Keeps the description queue topped up. Every weapon with flavor text
+        is equally likely to be picked.
+        """
+        while True:
+            try:
+                await self.load_index()
+                if not self.candidates:
+                    await asyncio.sleep(60)
+                    continue
+                pageid = random.choice(self.candidates)
+                text = await weaponDescriptionFromId(self.wiki, pageid)
+            except Exception as e:
+                logging.warning(f"Could not get a weapon description: {e}")
+                await asyncio.sleep(60)
+                continue
+            if text is None:
+                # No flavor text; don't pick it again until the index reloads.
+                self.candidates.remove(pageid)
+                continue
+            await self.descriptions.put({self.index[pageid]: text})
+
+    async def randomWeaponDescription(self):
+        """
+        Returns a dictionary mapping a random weapon's name to its flavor
+        text, straight from the queue. Only waits if the queue has run dry.
+        """
+        return await self.descriptions.get()
+
+
+# A full-text index over every weapon's flavor text, refreshed by revision
+# so only edited or new weapon pages are fetched again.
+class WeaponSearch:
+    def __init__(self, conn: str):
+        self.conn = conn
+
+    async def refresh(self, wiki: Wiki, index) -> int:
+        """
+        Extracts the flavor text of weapons in a getIndex() result that are
+        new or edited since the last refresh, and drops weapons that are gone.
+        Returns the number of weapons (re)indexed.
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            async with db.execute(
+                "SELECT pageid, revid FROM weapon_text_revisions"
+            ) as cursor:
+                indexed = {pageid: revid async for pageid, revid in cursor}
+            removed = [(pageid,) for pageid in indexed.keys() if pageid not in index]
+            await db.executemany("DELETE FROM weapon_text WHERE pageid = ?", removed)
+            await db.executemany(
+                "DELETE FROM weapon_text_revisions WHERE pageid = ?", removed
+            )
+            await db.commit()
+        count = 0
+        async for page in wiki.iter_revisions(list(index.keys())):
+            pageid = page["pageid"]
+            if indexed.get(pageid) == page["revid"]:
+                continue
+            try:
+                flavor = await weaponDescriptionFromId(wiki, pageid, page["revid"])
+            except Exception as e:
+                logging.warning(f"Could not index weapon {pageid}: {e}")
+                continue
+            async with aiosqlite.connect(self.conn) as db:
+                await db.execute("DELETE FROM weapon_text WHERE pageid = ?", (pageid,))
+                if flavor:
+                    await db.execute(
+                        "INSERT INTO weapon_text(pageid, name, flavor) VALUES (?, ?, ?)",
+                        (pageid, index[pageid], flavor),
+                    )
+                # Weapons without flavor text are recorded too, so they aren't
+                # fetched again until their page changes.
+                await db.execute(
+                    "INSERT OR REPLACE INTO weapon_text_revisions(pageid, revid)"
+                    " VALUES (?, ?)",
+                    (pageid, page["revid"]),
+                )
+                await db.commit()
+            count += 1
+        return count
+
+    async def search(self, query: str, limit: int = 5):
+        """
+        Searches weapon names and flavor text. Returns a list of
+        (name, highlighted flavor text) tuples, best match first.
+        """
+        # Quote every word so user input is never read as FTS5 syntax.
+        terms = " ".join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+        if not terms:
+            return []
+        cmd: str = """
+        SELECT name, highlight(weapon_text, 2, '**', '**') FROM weapon_text
+        WHERE weapon_text MATCH ?
+        ORDER BY rank
+        LIMIT ?;
+        """
+        async with aiosqlite.connect(self.conn) as db:
+            async with db.execute(cmd, (terms, limit)) as cursor:
+                rows = await cursor.fetchall()
+        return [(name, flavor) for name, flavor in rows]
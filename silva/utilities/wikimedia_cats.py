@@ -2,14 +2,16 @@
 # gets cat-related stuff from wikipedia.
 
 import aiohttp
-from typing import Dict
+from typing import AsyncIterator, Dict
 import random
 import io
+from silva.utilities import mediawiki
+from silva.utilities.http_client import HttpClient
 
 
 class wikicats:
-    def __init__(self):
-        pass
+    def __init__(self, client: HttpClient):
+        self.client = client
 
     async def async_init(self, image_id=None):
         self.cat_list = await self._get_cat_breeds()
@@ -17,12 +19,11 @@ class wikicats:
         self.images_list = await self._get_random_cat_images()
         self.info = await self._get_random_cat_image(image_id)
 
-    async def _get_wikimedia_query_api(
+    async def _iter_wikimedia_query_api(
         self, cmpageid: int, cmnamespace: int
-    ) -> Dict[str, str]:
-        """ Gets full list of category members based on numeric cmpageid
-        input. Requests for maximum number of entries. Returns JSON list
-        of entries. """
+    ) -> AsyncIterator[Dict[str, str]]:
+        """ Streams category members based on numeric cmpageid input,
+        following continuation so large categories aren't cut off. """
         # cmnamespace 14 is just for categories only, while cmnamespace 6
         # is for files.
         params = {
@@ -34,12 +35,21 @@ class wikicats:
             "cmlimit": "max",
         }
         url = "https://commons.wikimedia.org/w/api.php"
-        async with aiohttp.ClientSession() as session:
-            async_res = await session.get(url, params=params, timeout=10)
-        # The default return also returns batchcomplete information.
-        # We don't care, so we only return the category's members.
-        res = await async_res.json()
-        return res["query"]["categorymembers"]
+        async for member in mediawiki.iter_query(
+            self.client, url, params, "categorymembers"
+        ):
+            yield member
+
+    async def _get_wikimedia_query_api(
+        self, cmpageid: int, cmnamespace: int
+    ) -> Dict[str, str]:
+        """ Gets full list of category members based on numeric cmpageid
+        input. Requests for maximum number of entries. Returns JSON list
+        of entries. """
+        return [
+            member
+            async for member in self._iter_wikimedia_query_api(cmpageid, cmnamespace)
+        ]
 
     async def _get_wikimedia_imageinfo_api(self, pageid):
         """ Retrieves image information from a provided page ID. Returns a
@@ -54,10 +64,8 @@ class wikicats:
             "iiurlwidth": "720",
         }
         url = "https://commons.wikimedia.org/w/api.php"
-        async with aiohttp.ClientSession() as session:
-            r = await session.get(url, params=params, timeout=10)
+        res = await self.client.get_json(url, params=params)
         try:
-            res = await r.json()
             image_info = res["query"]["pages"][str(pageid)]["imageinfo"][0]
             image_info["imageid"] = pageid
         except KeyError:
@@ -103,9 +111,8 @@ class wikicats:
         """
         Downloads a picture.
         """
-        async with aiohttp.ClientSession() as session:
-            resp = await session.get(self.info["thumburl"], timeout=10)
-            if resp.status >= 400:
-                raise aiohttp.ClientResponseError((), resp.status)
-            output = io.BytesIO(await resp.read())
-            return output
+        resp = await self.client.get(self.info["thumburl"])
+        if resp.status >= 400:
+            raise aiohttp.ClientResponseError((), resp.status)
+        output = io.BytesIO(resp.body)
+        return output